@@ -1,30 +1,43 @@
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
+import anyio
 import socketio
 import os
-import psycopg2
+import threading
 from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base, GuestModel, MessageModel, ThreadModel
-from services.translation import process_message_translation, get_usage_stats, reset_provider, AIProvider
-import json
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import ValidationError
+from sqlalchemy import create_engine, cast, or_, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, sessionmaker
+from models import Base, GuestModel, MessageModel, ThreadModel, POSTGRES_SCHEMA_UPGRADES, new_id
+from services.translation import (
+    process_message_translation, get_usage_stats, reset_provider, AIProvider,
+    clear_translation_cache
+)
+from typing import List, Optional, Union
+import re
+import orjson
 
 # Lean MVP: In-memory event bus (replaces Redis)
-from services.eventbus import event_bus, cache, rate_limiter, Topics
+from services.eventbus import event_bus, cache as bus_cache, rate_limiter, Topics
 from services.adapters import normalize_message, UnifiedMessage
 
 # Phase 4: Security, Observability, and Resilience imports
 from services.security import (
     create_access_token, create_refresh_token, verify_token, refresh_access_token,
     logout, Role, Permission, has_permission, check_rate_limit,
-    log_audit_event, get_security_stats, sanitize_input
+    log_audit_event, get_security_stats, sanitize_input, flush_audit_log,
+    start_audit_writer
 )
 from services.observability import (
     metrics, logger, correlation_id_var,
-    get_observability_dashboard, check_alerts, HealthStatus
+    get_observability_dashboard, check_alerts, HealthStatus,
+    start_resource_sampler, get_system_resources
 )
+from services.middleware import CorrelationIdMiddleware, json_body, json_body_openapi
 from services.resilience import (
     get_resilience_stats, get_all_circuit_breakers, get_circuit_breaker,
     get_dlq, DegradationMode, set_degradation_mode, get_degradation_mode,
@@ -35,17 +48,103 @@ from services.resilience import (
 DB_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/resortos")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 
+# Max translation calls / batch writes running at once in worker threads
+PROCESS_EVENT_CONCURRENCY = int(os.getenv("PROCESS_EVENT_CONCURRENCY", "16"))
+# Seconds before a /health/deep dependency probe is reported as failed
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "1"))
+# Threadpool tokens shared by sync FastAPI endpoints (anyio default is 40)
+THREADPOOL_TOKENS = int(os.getenv("THREADPOOL_TOKENS", "100"))
+# psycopg prepares a statement server-side once a pooled connection has run it
+# this many times ("off" disables, e.g. behind a transaction-mode PgBouncer)
+PG_PREPARE_THRESHOLD = os.getenv("PG_PREPARE_THRESHOLD", "5")
+# Connection pool: persistent connections, burst overflow, and recycling
+# before Cloud SQL / proxies drop idle connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 # Socket.IO Setup
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+class _OrjsonCodec:
+    """json-module stand-in for Socket.IO: orjson encodes datetimes and is much faster."""
+    
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+    
+    @staticmethod
+    def loads(data, **kwargs):
+        return orjson.loads(data)
+
+
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    json=_OrjsonCodec
+)
 socket_app = socketio.ASGIApp(sio)
 
 # DB Setup
-engine = create_engine(DB_URL)
+def _engine_args(db_url: str):
+    """Use the psycopg 3 driver for PostgreSQL so repeated queries reuse server-side plans."""
+    url = make_url(db_url)
+    if url.drivername in ("postgresql", "postgres"):
+        url = url.set(drivername="postgresql+psycopg")
+    kwargs = {}
+    if url.drivername == "postgresql+psycopg":
+        kwargs["connect_args"] = {
+            "prepare_threshold": None if PG_PREPARE_THRESHOLD == "off" else int(PG_PREPARE_THRESHOLD)
+        }
+    if url.get_backend_name() == "postgresql":
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+    return url, kwargs
+
+
+_db_url, _engine_kwargs = _engine_args(DB_URL)
+engine = create_engine(_db_url, **_engine_kwargs)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create Tables (Simplified Migration)
+# Advisory lock key held while applying POSTGRES_SCHEMA_UPGRADES, so workers
+# starting together run them one after another instead of racing
+SCHEMA_UPGRADE_LOCK_KEY = 0x5245534F  # "RESO"
+_CONCURRENT_INDEX_RE = re.compile(r"CREATE INDEX CONCURRENTLY IF NOT EXISTS (\w+)")
+
+
+def _apply_schema_upgrades(conn):
+    """
+    Run each upgrade statement on its own, so one failure (e.g. a lock
+    timeout) is reported and the rest still run. A failed CONCURRENTLY
+    build leaves an INVALID index that IF NOT EXISTS would never rebuild,
+    so any such index is dropped before its CREATE is retried.
+    """
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_UPGRADE_LOCK_KEY})
+    try:
+        for ddl in POSTGRES_SCHEMA_UPGRADES:
+            try:
+                index = _CONCURRENT_INDEX_RE.search(ddl)
+                if index and conn.execute(
+                    text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                    {"name": index.group(1)}
+                ).scalar():
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.group(1)}"))
+                    print(f"🔧 Dropped invalid index {index.group(1)} for rebuild")
+                conn.execute(text(ddl))
+            except Exception as e:
+                print(f"❌ Schema upgrade failed: {' '.join(ddl.split())[:120]}: {e}")
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_UPGRADE_LOCK_KEY})
+
+
 try:
     Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            _apply_schema_upgrades(conn)
     print("✅ Database tables created/verified.")
 except Exception as e:
     print(f"❌ Database Schema Error: {e}")
@@ -59,112 +158,313 @@ def get_db():
 
 
 # Logic to Process & Persist Event
-def process_event(event_data: str):
+def _is_translatable(content: dict) -> bool:
+    return content.get("type") == "text" and bool(content.get("body"))
+
+
+def _translate_content(content: dict) -> Optional[dict]:
+    """Auto-detect and translate a text message body; None if not applicable."""
+    if not _is_translatable(content):
+        return None
     try:
-        data = json.loads(event_data)
-        # Check if it's a UnifiedMessage (has 'channel', 'content', 'guest')
-        if "channel" not in data or "guest" not in data:
-            print("⚠️ Skipping non-message event")
-            return
-            
-        db = SessionLocal()
-        
-        # 1. Find or Create Guest
-        guest_info = data.get("guest")
-        sender_id = data.get("sender_id")
-        channel = data.get("channel")
-        
-        # Simple lookup by channel_ids (JSONB query would be better, but MVP assumes string/dict match)
-        # For MVP, we'll do a naive search or create
-        # In prod: Use unique constraint on channel_ids->>'whatsapp'
-        
-        existing_guest = None
-        # Optimization: We should query by channel_ids in a real implementation
-        # For now, let's just create a new guest if we don't have a reliable ID 
-        # (This is a simplification. In reality we need to search first)
-        
-        # Let's try to query all guests and find match in Python (inefficient but safe for <100 guests MVP)
-        # TODO: Replace with PG JSONB query
-        all_guests = db.query(GuestModel).all()
-        for g in all_guests:
-            if g.channel_ids and g.channel_ids.get(channel) == sender_id:
-                existing_guest = g
-                break
-        
-        if not existing_guest:
-            new_guest = GuestModel(
+        return process_message_translation(
+            content["body"],
+            guest_language=None  # Auto-detect
+        )
+    except Exception as e:
+        logger.warning("Translation skipped", error=str(e))
+        return None
+
+
+def _find_guests(db, keys: set) -> dict:
+    """Resolve (channel, sender_id) pairs to guests with one indexed query."""
+    # Each term is channel_ids @> {"<channel>": "<sender_id>"} (GIN, jsonb_path_ops)
+    conditions = [
+        GuestModel.channel_ids.op("@>")(cast({channel: sender_id}, JSONB))
+        for channel, sender_id in keys
+    ]
+    guests = {}
+    for guest in db.query(GuestModel).filter(or_(*conditions)):
+        for channel_key in (guest.channel_ids or {}).items():
+            if channel_key in keys:
+                guests.setdefault(channel_key, guest)
+    return guests
+
+
+# Serializes guest creation across concurrent batches so two batches that
+# both see a new sender don't each insert a guest for it (channel_ids is a
+# JSONB map, so there is no unique constraint to fall back on)
+_guest_create_lock = threading.Lock()
+
+
+def _get_or_create_guests(db, pending: List[tuple]) -> dict:
+    """
+    (channel, sender_id) -> guest for a batch. Missing guests are created and
+    committed in a short transaction of their own, under _guest_create_lock,
+    after re-checking for guests another batch created meanwhile.
+    """
+    keys = {(d.get("channel"), d.get("sender_id")) for d, _ in pending}
+    guests = _find_guests(db, keys)
+    missing = keys - guests.keys()
+    if not missing:
+        return guests
+    
+    with _guest_create_lock:
+        guests.update(_find_guests(db, missing))
+        for data, _ in pending:
+            channel, sender_id = key = (data.get("channel"), data.get("sender_id"))
+            if key in guests:
+                continue
+            guest_info = data.get("guest") or {}
+            guest = GuestModel(
+                id=new_id(),
                 name=guest_info.get("name", "Unknown"),
                 channel_ids={channel: sender_id}
             )
-            db.add(new_guest)
-            db.commit()
-            db.refresh(new_guest)
-            existing_guest = new_guest
-            print(f"👤 Created new Guest: {existing_guest.id}")
-        else:
-            print(f"👤 Found existing Guest: {existing_guest.id}")
-            
-        # 2. Translate Message (if text content)
-        content = data.get("content", {})
-        original_body = content.get("body", "")
-        translated_body = original_body
-        detected_language = existing_guest.language or "en"
+            db.add(guest)
+            guests[key] = guest
+            logger.debug("Created new guest", guest_id=guest.id)
+        db.commit()
+    return guests
+
+
+def _persist_batch(pending: List[tuple]) -> List[tuple]:
+    """
+    Persist (event, translation) pairs in one session and one commit.
+    
+    If the batch commit fails, each message is retried on its own so one bad
+    row doesn't lose the rest. Returns (event, MessageModel) for every
+    message that was stored.
+    """
+    # Guests committed by _get_or_create_guests stay loaded for the message
+    # pass (no per-guest refresh), and returned messages stay readable
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        guests = _get_or_create_guests(db, pending)
         
-        if content.get("type") == "text" and original_body:
-            try:
-                translation_result = process_message_translation(
-                    original_body, 
-                    guest_language=None  # Auto-detect
-                )
-                translated_body = translation_result.get("translated_text", original_body)
-                detected_language = translation_result.get("detected_language", "en")
+        persisted = []
+        for data, translation in pending:
+            # Runs in a worker thread with a copied context, so this only
+            # tags this batch's log lines with the message id
+            correlation_id_var.set(data.get("id") or "")
+            sender_id = data.get("sender_id")
+            channel = data.get("channel")
+            existing_guest = guests[(channel, sender_id)]
+            
+            content = data.get("content") or {}
+            original_body = content.get("body", "")
+            message_fields = {}
+            
+            # Apply translation (text only; media skips the metadata
+            # entirely and leaves metadata_json to the column default)
+            if _is_translatable(content):
+                translated_body = original_body
+                detected_language = existing_guest.language or "en"
                 
-                # Update guest language if detected
-                if existing_guest.language != detected_language:
-                    existing_guest.language = detected_language
-                    db.commit()
-                    print(f"🌐 Updated Guest language: {detected_language}")
-            except Exception as e:
-                print(f"⚠️ Translation skipped: {e}")
+                if translation:
+                    translated_body = translation.get("translated_text", original_body)
+                    detected_language = translation.get("detected_language", "en")
+                    
+                    # Update guest language if detected (written in the same
+                    # commit as the message; unchanged values issue no UPDATE)
+                    if existing_guest.language != detected_language:
+                        existing_guest.language = detected_language
+                        logger.debug("Updated guest language", guest_id=existing_guest.id, language=detected_language)
+                
+                message_fields["metadata_json"] = {
+                    "translated_text": translated_body,
+                    "source_language": detected_language,
+                    "target_language": "en"
+                }
+            
+            # Persist Message with translation (stored in metadata)
+            new_msg = MessageModel(
+                channel=channel,
+                direction=data.get("direction"),
+                sender_id=sender_id,
+                content_type=content.get("type"),
+                body=original_body,
+                guest_id=existing_guest.id,
+                **message_fields
+            )
+            db.add(new_msg)
+            persisted.append((data, new_msg))
         
-        # 3. Persist Message with translation
-        new_msg = MessageModel(
-            channel=channel,
-            direction=data.get("direction"),
-            sender_id=sender_id,
-            content_type=content.get("type"),
-            body=original_body,
-            guest_id=existing_guest.id
-        )
-        # Store translated text in metadata
-        new_msg.metadata_json = {
-            "translated_text": translated_body,
-            "source_language": detected_language,
-            "target_language": "en"
-        }
-        db.add(new_msg)
         db.commit()
-        print(f"💾 Persisted Message: {new_msg.id}")
-        
-        return new_msg
-        
-    except Exception as e:
-        print(f"❌ Processing Error: {e}")
+        logger.debug("Persisted messages", count=len(persisted))
+        return persisted
+    
+    except Exception:
+        db.rollback()
+        if len(pending) == 1:
+            logger.exception("Event processing failed", message_id=pending[0][0].get("id"))
+            return []
+        logger.exception("Event batch failed, retrying messages individually", batch_size=len(pending))
     finally:
         db.close()
+    
+    persisted = []
+    for item in pending:
+        persisted.extend(_persist_batch([item]))
+    return persisted
+
+
+def _store_event_batch(events: List[dict], translations: Optional[List[Optional[dict]]] = None) -> List[tuple]:
+    """process_event_batch() returning (event, MessageModel) pairs."""
+    if translations is None:
+        translations = [None] * len(events)
+        translate_inline = True
+    else:
+        translate_inline = False
+    
+    pending = []
+    for data, translation in zip(events, translations):
+        # Check if it's a UnifiedMessage (has 'channel', 'content', 'guest')
+        if "channel" not in data or "guest" not in data:
+            logger.debug("Skipping non-message event")
+            continue
+        if translate_inline:
+            # Outside the DB transaction, and not repeated if a retry is needed
+            translation = _translate_content(data.get("content") or {})
+        pending.append((data, translation))
+    if not pending:
+        return []
+    return _persist_batch(pending)
+
+
+def process_event_batch(events: List[dict], translations: Optional[List[Optional[dict]]] = None) -> List[MessageModel]:
+    """
+    Persist a batch of UnifiedMessage payloads in one session and one commit.
+    
+    translations, when given, holds the pre-computed _translate_content()
+    result for each event (same order), so AI calls run outside the DB
+    transaction. Returns the stored messages; a message that cannot be
+    stored is logged and left out without affecting the rest.
+    """
+    return [message for _, message in _store_event_batch(events, translations)]
+
+
+def process_event(event_data: Union[str, bytes]):
+    """Persist a single serialized UnifiedMessage event (str or raw bytes)."""
+    try:
+        data = orjson.loads(event_data)
+    except Exception as e:
+        logger.error("Invalid event payload", error=str(e))
+        return None
+    persisted = process_event_batch([data])
+    return persisted[0] if persisted else None
 
 # Background Task for Event Processing (In-Memory Event Bus)
+# Inbound messages are coalesced into batches of up to EVENT_BATCH_SIZE (or
+# whatever arrives within EVENT_BATCH_MS of the first one) so the guest
+# lookup and COMMIT are paid once per batch instead of once per message.
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "64"))
+EVENT_BATCH_MS = int(os.getenv("EVENT_BATCH_MS", "20"))
+
+_process_sem = asyncio.Semaphore(PROCESS_EVENT_CONCURRENCY)
+_message_queue: asyncio.Queue = asyncio.Queue()
+_background_tasks = set()
+# Most recently dispatched batch; the next one stores and emits after it
+_last_batch: Optional[asyncio.Task] = None
+
+
+def _spawn(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _emit(event: str, data):
+    try:
+        await sio.emit(event, data=data)
+    except Exception:
+        logger.exception("Socket.IO emit failed", event=event)
+
+
+async def _translate_limited(data: dict) -> Optional[dict]:
+    content = data.get("content") or {}
+    if not _is_translatable(content):
+        return None
+    # gather() runs each call as its own task, so this is per message
+    correlation_id_var.set(data.get("id") or "")
+    async with _process_sem:
+        return await asyncio.to_thread(_translate_content, content)
+
+
+async def _process_and_emit(batch: List[dict], previous: Optional[asyncio.Task] = None):
+    """
+    Translate concurrently, persist the batch in a worker thread, then push
+    it to the frontend.
+    
+    Storing and emitting wait for the previous batch, so messages are
+    committed (and stamped by the database) and emitted in arrival order
+    even when an earlier batch's translations are slower.
+    """
+    try:
+        translations = await asyncio.gather(
+            *(_translate_limited(data) for data in batch)
+        )
+        if previous is not None:
+            # wait() rather than await: the previous batch's outcome is its own
+            await asyncio.wait([previous])
+        async with _process_sem:
+            stored = await asyncio.to_thread(_store_event_batch, batch, list(translations))
+        # Emit to frontend via Socket.io (one emit per batch, stored messages only)
+        stored = [data for data, _ in stored]
+        if len(stored) == 1:
+            await _emit('new_message', stored[0])
+        elif stored:
+            await _emit('new_message_batch', stored)
+    except Exception:
+        logger.exception("Event handling failed", batch_size=len(batch))
+
+
+def _dispatch_batch(batch: List[dict]):
+    """Start a batch now; its translations overlap earlier batches, its writes follow them."""
+    global _last_batch
+    _last_batch = _spawn(_process_and_emit(batch, _last_batch))
+
+
+async def _batch_messages():
+    """Drain the message queue into batches and dispatch each one."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _message_queue.get()]
+        deadline = loop.time() + EVENT_BATCH_MS / 1000
+        try:
+            while len(batch) < EVENT_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_message_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Shutting down: still persist what was already taken off the queue
+            _dispatch_batch(batch)
+            raise
+        
+        # Dispatch without awaiting so the next batch's translations can
+        # start while this one is still being translated
+        _dispatch_batch(batch)
+
+
+async def _drain_message_queue():
+    """At shutdown, persist everything still queued and wait for in-flight batches."""
+    while not _message_queue.empty():
+        size = min(EVENT_BATCH_SIZE, _message_queue.qsize())
+        _dispatch_batch([_message_queue.get_nowait() for _ in range(size)])
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
 async def setup_event_handlers():
     """Setup event handlers for the in-memory event bus."""
     async def handle_message_event(event):
-        try:
-            data = event.payload
-            # Process and persist the message
-            await asyncio.to_thread(process_event, json.dumps(data))
-            # Emit to frontend via Socket.io
-            await sio.emit('new_message', data=data)
-        except Exception as e:
-            print(f"❌ Event handling error: {e}")
+        _message_queue.put_nowait(event.payload)
     
     event_bus.subscribe(Topics.MESSAGE_INCOMING, handle_message_event)
     await event_bus.start()
@@ -173,23 +473,48 @@ async def setup_event_handlers():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Room for sync endpoints alongside process_event worker threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
     # Startup: Initialize in-memory event bus
     await setup_event_handlers()
+    batcher = asyncio.create_task(_batch_messages())
+    start_audit_writer()
+    start_resource_sampler()
+    # Routes are fixed once the app is imported
+    global APP_ROUTE_COUNT
+    APP_ROUTE_COUNT = len(app.routes)
     yield
     # Shutdown: Stop event bus
     await event_bus.stop()
+    batcher.cancel()
+    with suppress(asyncio.CancelledError):
+        await batcher
+    await _drain_message_queue()
+    flush_audit_log()
+
+class _ORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that, like the json module, stringifies int dict keys (e.g. status codes)."""
+    
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
 
-app = FastAPI(title="ResortOS Core", version="0.1.0", lifespan=lifespan)
+# orjson renders every JSON response body (C encoder, native datetime/UUID)
+app = FastAPI(
+    title="ResortOS Core",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=_ORJSONResponse
+)
+app.add_middleware(CorrelationIdMiddleware)
 
 # Mount Socket.IO to /socket.io
 app.mount("/socket.io", socket_app)
 
-# Configuration
-DB_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/resortos")
-REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
-
 @app.get("/")
-def health_check():
+async def health_check():
     return {"status": "ok", "service": "core", "architecture": "lean_mvp"}
 
 
@@ -209,10 +534,12 @@ async def receive_whatsapp(request: dict):
         # Publish to in-memory event bus
         await event_bus.publish(
             Topics.MESSAGE_INCOMING, 
-            unified_msg.model_dump()
+            unified_msg.to_event()
         )
         
         return {"status": "received", "id": unified_msg.id, "channel": "whatsapp"}
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
@@ -229,10 +556,12 @@ async def receive_line(request: dict):
         # Publish to in-memory event bus
         await event_bus.publish(
             Topics.MESSAGE_INCOMING,
-            unified_msg.model_dump()
+            unified_msg.to_event()
         )
         
         return {"status": "received", "id": unified_msg.id, "channel": "line"}
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
     except ValueError as e:
         # Non-message events - acknowledge but don't process
         return {"status": "acknowledged", "note": str(e)}
@@ -252,35 +581,68 @@ async def receive_web_message(request: dict):
         # Publish to in-memory event bus
         await event_bus.publish(
             Topics.MESSAGE_INCOMING,
-            unified_msg.model_dump()
+            unified_msg.to_event()
         )
         
         return {"status": "received", "id": unified_msg.id, "channel": "web"}
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Web message failed: {str(e)}")
 
 
-@app.get("/health/deep")
-def deep_health_check():
-    checks = {}
-    
-    # Check PostgreSQL
+def _ping_database():
+    """SELECT 1 over a pooled connection (no per-probe TCP/auth handshake)."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _check_database() -> dict:
+    # Bounded so a hung database can't stall the probe
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        checks["database"] = "connected"
-        conn.close()
+        await asyncio.wait_for(asyncio.to_thread(_ping_database), HEALTH_CHECK_TIMEOUT)
+        return {"database": "connected"}
+    except asyncio.TimeoutError:
+        return {"database": f"failed: timed out after {HEALTH_CHECK_TIMEOUT}s"}
     except Exception as e:
-        checks["database"] = f"failed: {str(e)}"
-    
-    # Check in-memory event bus (replaces Redis)
+        return {"database": f"failed: {str(e)}"}
+
+
+async def _check_event_bus() -> dict:
+    # In-memory event bus (replaces Redis)
     try:
         bus_stats = event_bus.get_stats()
-        checks["event_bus"] = "running" if bus_stats["running"] else "stopped"
-        checks["cache_size"] = cache.get_stats()["size"]
+        return {
+            "event_bus": "running" if bus_stats["running"] else "stopped",
+            "cache_size": bus_cache.get_stats()["size"]
+        }
+    except Exception as e:
+        return {"event_bus": f"error: {str(e)}"}
+
+
+async def _check_ai_providers() -> dict:
+    # Translation/copilot providers still enabled (not disabled by failures)
+    try:
+        ai_stats = get_usage_stats()
+        active_providers = sum(1 for p in ai_stats.get("providers", {}).values() if p.get("enabled"))
+        return {"ai_providers": {
+            "status": "healthy" if active_providers > 0 else "degraded",
+            "active_count": active_providers
+        }}
     except Exception as e:
-        checks["event_bus"] = f"error: {str(e)}"
+        return {"ai_providers": {"status": "unknown", "error": str(e)[:100]}}
+
+
+# Dependency probes for /health/deep; run concurrently so latency is the
+# slowest probe rather than the sum of them
+HEALTH_CHECKS = (_check_database, _check_event_bus, _check_ai_providers)
+
+
+@app.get("/health/deep")
+async def deep_health_check():
+    checks = {}
+    for result in await asyncio.gather(*(check() for check in HEALTH_CHECKS)):
+        checks.update(result)
     
     if "database" in checks and "failed" in checks.get("database", ""):
         raise HTTPException(status_code=503, detail=checks)
@@ -289,7 +651,7 @@ def deep_health_check():
 
 
 @app.get("/ai/usage")
-def get_ai_usage():
+async def get_ai_usage():
     """Get AI provider usage statistics and monitoring data."""
     return get_usage_stats()
 
@@ -313,6 +675,13 @@ def reset_ai_provider(provider: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ai/cache/clear")
+async def clear_ai_cache():
+    """Drop memoized language detection and translation results."""
+    clear_translation_cache()
+    return {"status": "ok", "message": "Translation cache cleared"}
+
+
 # ============================================================================
 # PHASE 3: COPILOT ENDPOINTS
 # ============================================================================
@@ -324,7 +693,10 @@ import shutil
 from fastapi import UploadFile, File
 
 # Import Phase 3 services
-from services.copilot import generate_smart_reply, get_copilot_stats, record_suggestion_feedback
+from services.copilot import (
+    generate_smart_reply, get_copilot_stats, record_suggestion_feedback,
+    analyze_message_urgency_batch
+)
 from services.sla import get_sla_stats, calculate_sla_status, SLAMonitor
 from services.knowledge import (
     ingest_pdf_document, search_knowledge, get_knowledge_stats, init_chromadb
@@ -347,8 +719,28 @@ class SuggestionFeedback(BaseModel):
     rating: Optional[int] = None  # 1-5
 
 
+def _load_conversation_history(thread_id: str) -> List[dict]:
+    """Last 10 messages of a thread, oldest first, for the copilot prompt."""
+    db = SessionLocal()
+    try:
+        # Only the two columns the prompt needs, as plain rows
+        rows = db.execute(
+            select(MessageModel.direction, MessageModel.body)
+            .where(MessageModel.thread_id == thread_id)
+            .order_by(MessageModel.timestamp.desc())
+            .limit(10)
+        ).all()
+        
+        return [
+            {"direction": direction, "body": body}
+            for direction, body in reversed(rows)
+        ]
+    finally:
+        db.close()
+
+
 @app.post("/copilot/suggest")
-def copilot_suggest(request: SuggestRequest):
+async def copilot_suggest(request: SuggestRequest):
     """
     Generate a smart reply suggestion using RAG.
     Retrieves relevant SOPs and generates context-aware response.
@@ -357,20 +749,11 @@ def copilot_suggest(request: SuggestRequest):
         # Get conversation history if thread_id provided
         conversation_history = []
         if request.thread_id:
-            db = SessionLocal()
-            try:
-                messages = db.query(MessageModel).filter(
-                    MessageModel.thread_id == request.thread_id
-                ).order_by(MessageModel.timestamp.desc()).limit(10).all()
-                
-                conversation_history = [
-                    {"direction": m.direction, "body": m.body}
-                    for m in reversed(messages)
-                ]
-            finally:
-                db.close()
+            conversation_history = await asyncio.to_thread(
+                _load_conversation_history, request.thread_id
+            )
         
-        result = generate_smart_reply(
+        result = await generate_smart_reply(
             guest_message=request.message,
             conversation_history=conversation_history,
             channel=request.channel,
@@ -389,40 +772,50 @@ def copilot_suggest(request: SuggestRequest):
 
 
 @app.post("/copilot/feedback")
-def copilot_feedback(feedback: SuggestionFeedback):
+def copilot_feedback(feedback: SuggestionFeedback, db: Session = Depends(get_db)):
     """
     Record feedback on a copilot suggestion.
     Used to improve suggestion quality over time.
     """
-    db = SessionLocal()
-    try:
-        success = record_suggestion_feedback(
-            suggestion_id=feedback.suggestion_id,
-            was_used=feedback.was_used,
-            rating=feedback.rating,
-            db=db
-        )
-        return {"recorded": success}
-    finally:
-        db.close()
+    success = record_suggestion_feedback(
+        suggestion_id=feedback.suggestion_id,
+        was_used=feedback.was_used,
+        rating=feedback.rating,
+        db=db
+    )
+    return {"recorded": success}
 
 
 @app.get("/copilot/stats")
-def copilot_statistics():
+def copilot_statistics(db: Session = Depends(get_db)):
     """
     Get Copilot usage and knowledge base statistics.
     """
-    db = SessionLocal()
-    try:
-        return get_copilot_stats(db)
-    finally:
-        db.close()
+    return get_copilot_stats(db)
 
 
 # ============================================================================
 # PHASE 3: KNOWLEDGE BASE ENDPOINTS
 # ============================================================================
 
+# Upload bytes copied per read; the copy and the ingest both run off the event loop
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _ingest_uploaded_pdf(tmp_path: str, filename: str, title: Optional[str], description: Optional[str]) -> dict:
+    db = SessionLocal()
+    try:
+        return ingest_pdf_document(
+            pdf_path=tmp_path,
+            filename=filename,
+            title=title or filename,
+            description=description,
+            db=db
+        )
+    finally:
+        db.close()
+
+
 @app.post("/knowledge/upload")
 async def upload_knowledge_document(
     file: UploadFile = File(...),
@@ -439,21 +832,13 @@ async def upload_knowledge_document(
     # Save uploaded file temporarily
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            shutil.copyfileobj(file.file, tmp)
             tmp_path = tmp.name
+            await asyncio.to_thread(shutil.copyfileobj, file.file, tmp, UPLOAD_CHUNK_SIZE)
         
-        db = SessionLocal()
-        try:
-            result = ingest_pdf_document(
-                pdf_path=tmp_path,
-                filename=file.filename,
-                title=title or file.filename,
-                description=description,
-                db=db
-            )
-            return result
-        finally:
-            db.close()
+        # Chunking + embedding is CPU/network heavy; keep it off the loop
+        return await asyncio.to_thread(
+            _ingest_uploaded_pdf, tmp_path, file.filename, title, description
+        )
     finally:
         # Cleanup temp file
         if 'tmp_path' in locals():
@@ -490,60 +875,123 @@ def knowledge_statistics():
 # ============================================================================
 
 @app.get("/sla/stats")
-def sla_statistics():
+def sla_statistics(db: Session = Depends(get_db)):
     """
     Get SLA compliance statistics for active threads.
     """
-    db = SessionLocal()
-    try:
-        return get_sla_stats(db)
-    finally:
-        db.close()
+    return get_sla_stats(db)
 
 
 @app.get("/sla/thread/{thread_id}")
-def thread_sla_status(thread_id: str):
+def thread_sla_status(thread_id: str, db: Session = Depends(get_db)):
     """
     Get SLA status for a specific thread.
     """
+    thread = db.execute(
+        select(ThreadModel.last_guest_message, ThreadModel.last_agent_reply)
+        .where(ThreadModel.id == thread_id)
+    ).first()
+    if not thread:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    
+    sla_info = calculate_sla_status(
+        thread.last_guest_message,
+        thread.last_agent_reply
+    )
+    
+    return {
+        "thread_id": thread_id,
+        **sla_info
+    }
+
+
+def _load_unanswered_threads(limit: int) -> list:
+    """Active threads whose last guest message has no reply yet, longest waiting first."""
+    def latest_inbound(column):
+        # messages_thread_ts_desc serves each per-thread lookup
+        return (
+            select(column)
+            .where(MessageModel.thread_id == ThreadModel.id, MessageModel.direction == "inbound")
+            .order_by(MessageModel.timestamp.desc())
+            .limit(1)
+            .correlate(ThreadModel)
+            .scalar_subquery()
+        )
+    
     db = SessionLocal()
     try:
-        thread = db.query(ThreadModel).filter(ThreadModel.id == thread_id).first()
-        if not thread:
-            raise HTTPException(status_code=404, detail="Thread not found")
-        
-        sla_info = calculate_sla_status(
-            thread.last_guest_message,
-            thread.last_agent_reply
-        )
-        
-        return {
-            "thread_id": thread_id,
-            **sla_info
-        }
+        return db.execute(
+            select(
+                ThreadModel.id,
+                ThreadModel.last_guest_message,
+                ThreadModel.last_agent_reply,
+                latest_inbound(MessageModel.body).label("body"),
+                latest_inbound(MessageModel.channel).label("channel")
+            )
+            .where(
+                ThreadModel.status == "active",
+                ThreadModel.last_guest_message.isnot(None),
+                or_(
+                    ThreadModel.last_agent_reply.is_(None),
+                    ThreadModel.last_agent_reply < ThreadModel.last_guest_message
+                )
+            )
+            .order_by(ThreadModel.last_guest_message)
+            .limit(limit)
+        ).all()
     finally:
         db.close()
 
 
+@app.get("/sla/triage")
+async def sla_triage(limit: int = 100):
+    """
+    Rate the urgency of every unanswered thread's latest guest message
+    (batched provider calls) and return them most urgent first.
+    """
+    rows = await asyncio.to_thread(_load_unanswered_threads, limit)
+    triage = []
+    items = []
+    for row in rows:
+        if not row.body:
+            continue
+        sla_info = calculate_sla_status(row.last_guest_message, row.last_agent_reply)
+        triage.append({"thread_id": row.id, "message": row.body, **sla_info})
+        items.append({
+            "message": row.body,
+            "wait_time_minutes": sla_info["wait_time_minutes"],
+            "channel": row.channel or "whatsapp"
+        })
+    
+    for entry, urgency in zip(triage, await analyze_message_urgency_batch(items)):
+        entry.update(urgency)
+    # Most urgent first; longest wait breaks ties (models may return urgency as text)
+    triage.sort(
+        key=lambda entry: (
+            entry["urgency"] if isinstance(entry["urgency"], int) else 3,
+            entry["wait_time_minutes"]
+        ),
+        reverse=True
+    )
+    
+    return {"count": len(triage), "threads": triage}
+
+
 # ============================================================================
 # PHASE 3: COPILOT DASHBOARD ENDPOINT
 # ============================================================================
 
 @app.get("/copilot/dashboard")
-def copilot_dashboard():
+def copilot_dashboard(db: Session = Depends(get_db)):
     """
     Get comprehensive dashboard data for the Copilot UI.
     Combines SLA, knowledge, and suggestion stats.
     """
-    db = SessionLocal()
-    try:
-        return {
-            "sla": get_sla_stats(db),
-            "copilot": get_copilot_stats(db),
-            "knowledge": get_knowledge_stats()
-        }
-    finally:
-        db.close()
+    return {
+        "sla": get_sla_stats(db),
+        "copilot": get_copilot_stats(db),
+        "knowledge": get_knowledge_stats()
+    }
 
 
 # ============================================================================
@@ -570,28 +1018,30 @@ class RefreshRequest(BaseModel):
     refresh_token: str
 
 
-@app.post("/auth/login")
-def login(request: LoginRequest):
+# Demo authentication (replace with real auth in production); keys are lowercase
+DEMO_USERS = {
+    "admin": {"role": Role.SUPER_ADMIN, "name": "Admin User"},
+    "manager": {"role": Role.RESORT_MANAGER, "name": "Resort Manager"},
+    "agent": {"role": Role.FRONT_DESK_AGENT, "name": "Front Desk Agent"},
+    "viewer": {"role": Role.READONLY, "name": "View Only User"}
+}
+
+
+@app.post("/auth/login", openapi_extra=json_body_openapi(LoginRequest))
+def login(request: LoginRequest = Depends(json_body(LoginRequest))):
     """
     Authenticate user and return JWT tokens.
     
     For demo purposes, accepts any username/password.
     In production, validate against user database.
     """
-    # Demo authentication (replace with real auth in production)
-    demo_users = {
-        "admin": {"role": Role.SUPER_ADMIN, "name": "Admin User"},
-        "manager": {"role": Role.RESORT_MANAGER, "name": "Resort Manager"},
-        "agent": {"role": Role.FRONT_DESK_AGENT, "name": "Front Desk Agent"},
-        "viewer": {"role": Role.READONLY, "name": "View Only User"}
-    }
-    
-    user_info = demo_users.get(request.username.lower())
+    username = request.username.lower()
+    user_info = DEMO_USERS.get(username)
     if not user_info:
         # For demo, default to front desk agent
         user_info = {"role": Role.FRONT_DESK_AGENT, "name": request.username}
     
-    user_id = f"user_{request.username.lower()}"
+    user_id = f"user_{username}"
     
     access_token = create_access_token(
         user_id=user_id,
@@ -670,7 +1120,7 @@ def get_current_user_info(authorization: str = None):
 # -- Observability Endpoints --
 
 @app.get("/metrics")
-def get_metrics():
+async def get_metrics():
     """
     Get golden signals metrics (Prometheus-compatible).
     """
@@ -678,7 +1128,7 @@ def get_metrics():
 
 
 @app.get("/metrics/latency")
-def get_latency_metrics():
+async def get_latency_metrics():
     """
     Get detailed latency metrics by endpoint.
     """
@@ -686,7 +1136,7 @@ def get_latency_metrics():
 
 
 @app.get("/observability/dashboard")
-def observability_dashboard():
+async def observability_dashboard():
     """
     Get comprehensive observability dashboard data.
     Includes golden signals, alerts, and health status.
@@ -695,20 +1145,21 @@ def observability_dashboard():
 
 
 @app.get("/alerts")
-def get_active_alerts():
+async def get_active_alerts():
     """
     Get currently active alerts based on thresholds.
     """
+    alerts = check_alerts()
     return {
-        "alerts": check_alerts(),
-        "count": len(check_alerts())
+        "alerts": alerts,
+        "count": len(alerts)
     }
 
 
 # -- Resilience Endpoints --
 
 @app.get("/resilience/status")
-def get_resilience_status():
+async def get_resilience_status():
     """
     Get resilience infrastructure status.
     Includes circuit breakers, DLQs, and degradation mode.
@@ -717,13 +1168,20 @@ def get_resilience_status():
 
 
 @app.get("/resilience/circuit-breakers")
-def list_circuit_breakers():
+async def list_circuit_breakers():
     """
     Get status of all circuit breakers.
     """
     return get_all_circuit_breakers()
 
 
+DEGRADATION_MODES = {
+    "normal": DegradationMode.NORMAL,
+    "read_only": DegradationMode.READ_ONLY,
+    "offline": DegradationMode.OFFLINE
+}
+
+
 @app.post("/resilience/degradation/{mode}")
 def set_degradation(mode: str):
     """
@@ -734,16 +1192,10 @@ def set_degradation(mode: str):
     - read_only: Reject write operations
     - offline: Minimal operations only
     """
-    mode_map = {
-        "normal": DegradationMode.NORMAL,
-        "read_only": DegradationMode.READ_ONLY,
-        "offline": DegradationMode.OFFLINE
-    }
-    
-    if mode not in mode_map:
-        raise HTTPException(status_code=400, detail=f"Invalid mode. Use: {list(mode_map.keys())}")
+    if mode not in DEGRADATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Use: {list(DEGRADATION_MODES.keys())}")
     
-    set_degradation_mode(mode_map[mode])
+    set_degradation_mode(DEGRADATION_MODES[mode])
     
     log_audit_event(
         action="set_degradation_mode",
@@ -770,7 +1222,7 @@ def get_dlq_status(queue_name: str):
 # -- Security Endpoints --
 
 @app.get("/security/stats")
-def security_statistics():
+async def security_statistics():
     """
     Get security service statistics.
     """
@@ -797,75 +1249,6 @@ def get_audit_log_entries(
     }
 
 
-# -- Enhanced Health Check --
-
-@app.get("/health/deep")
-def deep_health_check():
-    """
-    Deep health check with dependency verification.
-    Checks database, Redis, AI providers, and Circuit Breakers.
-    """
-    checks = {}
-    overall_status = "healthy"
-    
-    # Database check
-    try:
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        checks["database"] = {"status": "healthy"}
-        db.close()
-    except Exception as e:
-        checks["database"] = {"status": "unhealthy", "error": str(e)[:100]}
-        overall_status = "unhealthy"
-    
-    # Redis check
-    try:
-        r = redis.from_url(REDIS_URL)
-        r.ping()
-        checks["redis"] = {"status": "healthy"}
-    except Exception as e:
-        checks["redis"] = {"status": "unhealthy", "error": str(e)[:100]}
-        overall_status = "degraded" if overall_status == "healthy" else overall_status
-    
-    # AI providers check
-    try:
-        ai_stats = get_usage_stats()
-        active_providers = sum(1 for p in ai_stats.get("providers", {}).values() if p.get("enabled"))
-        checks["ai_providers"] = {
-            "status": "healthy" if active_providers > 0 else "degraded",
-            "active_count": active_providers
-        }
-        if active_providers == 0:
-            overall_status = "degraded" if overall_status == "healthy" else overall_status
-    except Exception as e:
-        checks["ai_providers"] = {"status": "unknown", "error": str(e)[:100]}
-    
-    # Circuit breakers check
-    breakers = get_all_circuit_breakers()
-    open_breakers = [name for name, status in breakers.items() if status.get("state") == "open"]
-    checks["circuit_breakers"] = {
-        "status": "degraded" if open_breakers else "healthy",
-        "open_circuits": open_breakers
-    }
-    if open_breakers:
-        overall_status = "degraded" if overall_status == "healthy" else overall_status
-    
-    # Degradation mode check
-    deg_mode = get_degradation_mode()
-    checks["degradation_mode"] = {
-        "status": deg_mode.value,
-        "healthy": deg_mode == DegradationMode.NORMAL
-    }
-    
-    return {
-        "status": overall_status,
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "version": "2.0.0-phase4",
-        "checks": checks,
-        "alerts": check_alerts()
-    }
-
-
 # -- Rate Limit Info Endpoint --
 
 @app.get("/rate-limit/status")
@@ -891,35 +1274,29 @@ from services.compliance import (
 
 
 @app.get("/compliance/status")
-def compliance_status():
+def compliance_status(db: Session = Depends(get_db)):
     """
     Get overall GDPR/PDPA compliance status.
     Includes pending requests, overdue items, and consent metrics.
     """
-    db = SessionLocal()
-    try:
-        return get_compliance_status(db)
-    finally:
-        db.close()
+    return get_compliance_status(db)
 
 
 @app.get("/compliance/guest/{guest_id}/export")
-def export_guest(guest_id: str):
+def export_guest(guest_id: str, db: Session = Depends(get_db)):
     """
     Export all guest data in portable format (GDPR Article 20).
     Returns machine-readable JSON with all guest data.
     """
-    db = SessionLocal()
-    try:
-        log_audit_event(
-            action="data_export",
-            user_id="api",
-            resource_type="guest",
-            resource_id=guest_id
-        )
-        return export_guest_data(guest_id, db)
-    finally:
-        db.close()
+    log_audit_event(
+        action="data_export",
+        user_id="api",
+        resource_type="guest",
+        resource_id=guest_id
+    )
+    # Returning the response directly skips jsonable_encoder's Python walk
+    # over every exported message; orjson encodes the dict in one call
+    return _ORJSONResponse(export_guest_data(guest_id, db))
 
 
 class DeletionRequest(BaseModel):
@@ -928,30 +1305,26 @@ class DeletionRequest(BaseModel):
 
 
 @app.post("/compliance/guest/{guest_id}/delete")
-def delete_guest(guest_id: str, request: DeletionRequest):
+def delete_guest(guest_id: str, request: DeletionRequest, db: Session = Depends(get_db)):
     """
     Delete or anonymize guest data (GDPR Article 17 - Right to be Forgotten).
     
     Args:
         hard_delete: If true, permanently delete. If false, anonymize.
     """
-    db = SessionLocal()
-    try:
-        log_audit_event(
-            action="data_deletion" if request.hard_delete else "data_anonymization",
-            user_id="api",
-            resource_type="guest",
-            resource_id=guest_id,
-            details={"reason": request.reason}
-        )
-        result = delete_guest_data(
-            guest_id, db,
-            hard_delete=request.hard_delete,
-            reason=request.reason
-        )
-        return result
-    finally:
-        db.close()
+    log_audit_event(
+        action="data_deletion" if request.hard_delete else "data_anonymization",
+        user_id="api",
+        resource_type="guest",
+        resource_id=guest_id,
+        details={"reason": request.reason}
+    )
+    result = delete_guest_data(
+        guest_id, db,
+        hard_delete=request.hard_delete,
+        reason=request.reason
+    )
+    return result
 
 
 class ConsentUpdate(BaseModel):
@@ -960,56 +1333,44 @@ class ConsentUpdate(BaseModel):
 
 
 @app.post("/compliance/guest/{guest_id}/consent")
-def update_guest_consent(guest_id: str, consent: ConsentUpdate):
+def update_guest_consent(guest_id: str, consent: ConsentUpdate, db: Session = Depends(get_db)):
     """
     Update consent status for a guest.
     Creates audit trail for GDPR Article 7 compliance.
     """
-    db = SessionLocal()
-    try:
-        result = update_consent(
-            guest_id=guest_id,
-            consent_type=consent.consent_type,
-            granted=consent.granted,
-            db=db,
-            source="api"
-        )
-        return result
-    finally:
-        db.close()
+    result = update_consent(
+        guest_id=guest_id,
+        consent_type=consent.consent_type,
+        granted=consent.granted,
+        db=db,
+        source="api"
+    )
+    return result
 
 
 @app.get("/compliance/guest/{guest_id}/consent/history")
-def get_guest_consent_history(guest_id: str):
+def get_guest_consent_history(guest_id: str, db: Session = Depends(get_db)):
     """
     Get consent change history for audit compliance.
     """
-    db = SessionLocal()
-    try:
-        return {"guest_id": guest_id, "history": get_consent_history(guest_id, db)}
-    finally:
-        db.close()
+    return {"guest_id": guest_id, "history": get_consent_history(guest_id, db)}
 
 
 @app.post("/compliance/retention/apply")
-def apply_data_retention(dry_run: bool = True):
+def apply_data_retention(dry_run: bool = True, db: Session = Depends(get_db)):
     """
     Apply data retention policies to expired guest data.
     
     Args:
         dry_run: If true, only report what would be affected.
     """
-    db = SessionLocal()
-    try:
-        log_audit_event(
-            action="retention_policy_apply",
-            user_id="system",
-            resource_type="compliance",
-            details={"dry_run": dry_run}
-        )
-        return apply_retention_policy(db, dry_run=dry_run)
-    finally:
-        db.close()
+    log_audit_event(
+        action="retention_policy_apply",
+        user_id="system",
+        resource_type="compliance",
+        details={"dry_run": dry_run}
+    )
+    return apply_retention_policy(db, dry_run=dry_run)
 
 
 class PIICheckRequest(BaseModel):
@@ -1041,9 +1402,9 @@ def mask_pii_text(request: PIICheckRequest):
 # ============================================================================
 
 from services.backup import (
-    export_database_snapshot, save_backup_to_file, list_backups,
-    load_backup_from_file, cleanup_old_backups, restore_from_backup,
-    get_backup_stats
+    list_backups, cleanup_old_backups,
+    restore_from_backup_file, get_backup_stats, start_backup_job,
+    get_backup_job, list_backup_jobs
 )
 from services.users import (
     create_user, authenticate_user, change_password,
@@ -1059,30 +1420,33 @@ def backup_statistics():
 
 @app.get("/backup/list")
 def list_all_backups():
-    """List all available backups."""
-    return {"backups": list_backups()}
+    """List all available backups and recent backup jobs."""
+    return {"backups": list_backups(), "jobs": list_backup_jobs()}
 
 
 @app.post("/backup/create")
 def create_backup(include_messages: bool = True):
     """
-    Create a new database backup.
+    Queue a new database backup and return its job ID.
     
     Args:
         include_messages: Whether to include message data (can be large)
     """
-    db = SessionLocal()
-    try:
-        log_audit_event(
-            action="backup_create",
-            user_id="system",
-            resource_type="backup"
-        )
-        snapshot = export_database_snapshot(db, include_messages=include_messages)
-        result = save_backup_to_file(snapshot)
-        return result
-    finally:
-        db.close()
+    log_audit_event(
+        action="backup_create",
+        user_id="system",
+        resource_type="backup"
+    )
+    return start_backup_job(SessionLocal, include_messages=include_messages)
+
+
+@app.get("/backup/jobs/{job_id}")
+def backup_job_status(job_id: str):
+    """Get the status of a backup job."""
+    job = get_backup_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return job
 
 
 @app.post("/backup/cleanup")
@@ -1100,7 +1464,7 @@ def cleanup_backups(max_age_days: int = 30):
 
 
 @app.post("/backup/restore")
-def restore_backup(filepath: str, dry_run: bool = True):
+def restore_backup(filepath: str, dry_run: bool = True, db: Session = Depends(get_db)):
     """
     Restore from a backup file.
     
@@ -1108,22 +1472,18 @@ def restore_backup(filepath: str, dry_run: bool = True):
         filepath: Path to backup file
         dry_run: If true, only validate without making changes
     """
-    db = SessionLocal()
-    try:
-        snapshot = load_backup_from_file(filepath)
-        if not snapshot:
-            raise HTTPException(status_code=404, detail="Backup file not found")
-        
-        log_audit_event(
-            action="backup_restore",
-            user_id="system",
-            resource_type="backup",
-            details={"filepath": filepath, "dry_run": dry_run}
-        )
-        
-        return restore_from_backup(snapshot, db, dry_run=dry_run)
-    finally:
-        db.close()
+    if not os.path.exists(filepath):
+        raise HTTPException(status_code=404, detail="Backup file not found")
+    
+    log_audit_event(
+        action="backup_restore",
+        user_id="system",
+        resource_type="backup",
+        details={"filepath": filepath, "dry_run": dry_run}
+    )
+    
+    # Streams the file row by row rather than loading the whole snapshot
+    return restore_from_backup_file(filepath, db, dry_run=dry_run)
 
 
 # ============================================================================
@@ -1147,135 +1507,117 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
-@app.post("/users/create")
-def create_new_user(request: CreateUserRequest):
+@app.post("/users/create", openapi_extra=json_body_openapi(CreateUserRequest))
+def create_new_user(
+    request: CreateUserRequest = Depends(json_body(CreateUserRequest)),
+    db: Session = Depends(get_db)
+):
     """
     Create a new staff user.
     """
-    db = SessionLocal()
-    try:
-        result = create_user(
-            email=request.email,
-            password=request.password,
-            name=request.name,
-            role=request.role,
-            resort_id=request.resort_id,
-            db=db
+    result = create_user(
+        email=request.email,
+        password=request.password,
+        name=request.name,
+        role=request.role,
+        resort_id=request.resort_id,
+        db=db
+    )
+    
+    if "error" not in result:
+        log_audit_event(
+            action="user_create",
+            user_id="api",
+            resource_type="user",
+            resource_id=result.get("id")
         )
-        
-        if "error" not in result:
-            log_audit_event(
-                action="user_create",
-                user_id="api",
-                resource_type="user",
-                resource_id=result.get("id")
-            )
-        
-        return result
-    finally:
-        db.close()
+    
+    return result
 
 
-@app.post("/users/authenticate")
-def authenticate_staff_user(request: LoginRequest):
+@app.post("/users/authenticate", openapi_extra=json_body_openapi(LoginRequest))
+def authenticate_staff_user(
+    request: LoginRequest = Depends(json_body(LoginRequest)),
+    db: Session = Depends(get_db)
+):
     """
     Authenticate a user with email and password.
     Returns user info if successful, includes lockout info.
     """
-    db = SessionLocal()
-    try:
-        result = authenticate_user(request.username, request.password, db)
-        
-        if result.get("authenticated"):
-            log_audit_event(
-                action="user_login",
-                user_id=result["user"]["id"],
-                resource_type="auth"
-            )
-        
-        return result
-    finally:
-        db.close()
+    result = authenticate_user(request.username, request.password, db)
+    
+    if result.get("authenticated"):
+        log_audit_event(
+            action="user_login",
+            user_id=result["user"]["id"],
+            resource_type="auth"
+        )
+    
+    return result
 
 
 @app.get("/users/list")
-def list_all_users(resort_id: Optional[str] = None):
+def list_all_users(resort_id: Optional[str] = None, db: Session = Depends(get_db)):
     """
     List all staff users.
     """
-    db = SessionLocal()
-    try:
-        return {"users": list_users(db, resort_id=resort_id)}
-    finally:
-        db.close()
+    return {"users": list_users(db, resort_id=resort_id)}
 
 
 @app.post("/users/{user_id}/change-password")
-def change_user_password(user_id: str, request: ChangePasswordRequest):
+def change_user_password(user_id: str, request: ChangePasswordRequest, db: Session = Depends(get_db)):
     """
     Change a user's password.
     """
-    db = SessionLocal()
-    try:
-        result = change_password(
+    result = change_password(
+        user_id=user_id,
+        current_password=request.current_password,
+        new_password=request.new_password,
+        db=db
+    )
+    
+    if result.get("success"):
+        log_audit_event(
+            action="password_change",
             user_id=user_id,
-            current_password=request.current_password,
-            new_password=request.new_password,
-            db=db
+            resource_type="user"
         )
-        
-        if result.get("success"):
-            log_audit_event(
-                action="password_change",
-                user_id=user_id,
-                resource_type="user"
-            )
-        
-        return result
-    finally:
-        db.close()
+    
+    return result
 
 
 @app.post("/users/{user_id}/reset-password")
-def admin_reset_password(user_id: str, request: ResetPasswordRequest):
+def admin_reset_password(user_id: str, request: ResetPasswordRequest, db: Session = Depends(get_db)):
     """
     Admin password reset.
     """
-    db = SessionLocal()
-    try:
-        result = reset_password(user_id, request.new_password, db)
-        
-        if result.get("success"):
-            log_audit_event(
-                action="password_reset_admin",
-                user_id=user_id,
-                resource_type="user"
-            )
-        
-        return result
-    finally:
-        db.close()
+    result = reset_password(user_id, request.new_password, db)
+    
+    if result.get("success"):
+        log_audit_event(
+            action="password_reset_admin",
+            user_id=user_id,
+            resource_type="user"
+        )
+    
+    return result
 
 
 @app.post("/users/{user_id}/deactivate")
-def deactivate_staff_user(user_id: str):
+def deactivate_staff_user(user_id: str, db: Session = Depends(get_db)):
     """
     Deactivate a user account.
     """
-    db = SessionLocal()
-    try:
-        result = deactivate_user(user_id, db)
-        
-        if result.get("success"):
-            log_audit_event(
-                action="user_deactivate",
-                user_id=user_id,
-                resource_type="user"
-            )
-        
-        return result
-    finally:
-        db.close()
+    result = deactivate_user(user_id, db)
+    
+    if result.get("success"):
+        log_audit_event(
+            action="user_deactivate",
+            user_id=user_id,
+            resource_type="user"
+        )
+    
+    return result
 
 
 # ============================================================================
@@ -1284,7 +1626,7 @@ def deactivate_staff_user(user_id: str):
 
 from services.caching import cache, warm_guest_cache
 from services.tracing import (
-    get_recent_traces, get_trace_by_id, get_tracing_stats,
+    get_recent_traces_json, get_trace_by_id_json, get_tracing_stats,
     clear_trace_buffer
 )
 from services.performance import (
@@ -1307,9 +1649,16 @@ def invalidate_cache(pattern: Optional[str] = None):
     Invalidate cache entries.
     
     Args:
-        pattern: Redis key pattern to invalidate, or None for all.
+        pattern: Redis key pattern to invalidate (needs a literal prefix of
+            at least 3 characters), or None to clear L1.
     """
     if pattern:
+        literal_prefix = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        if len(literal_prefix) < 3:
+            raise HTTPException(
+                status_code=400,
+                detail="Pattern must start with at least 3 literal characters"
+            )
         count = cache.invalidate_pattern(pattern)
         return {"invalidated_count": count, "pattern": pattern}
     else:
@@ -1321,35 +1670,40 @@ class CacheWarmRequest(BaseModel):
     guest_ids: List[str]
 
 
-@app.post("/cache/warm")
-def warm_cache(request: CacheWarmRequest):
+@app.post("/cache/warm", openapi_extra=json_body_openapi(CacheWarmRequest))
+def warm_cache(
+    request: CacheWarmRequest = Depends(json_body(CacheWarmRequest)),
+    db: Session = Depends(get_db)
+):
     """Pre-populate cache with frequently accessed guests."""
-    db = SessionLocal()
-    try:
-        return warm_guest_cache(request.guest_ids, db)
-    finally:
-        db.close()
+    return warm_guest_cache(request.guest_ids, db)
 
 
 # -- Tracing Endpoints --
 
 @app.get("/tracing/stats")
-def tracing_statistics():
+async def tracing_statistics():
     """Get distributed tracing statistics."""
     return get_tracing_stats()
 
 
 @app.get("/tracing/recent")
-def recent_traces(limit: int = 50):
+async def recent_traces(limit: int = 50):
     """Get recent traces for debugging."""
-    return {"traces": get_recent_traces(limit)}
+    # Spans are stored pre-serialised; splice them straight into the body
+    return Response(
+        content=b'{"traces":' + get_recent_traces_json(limit) + b'}',
+        media_type="application/json"
+    )
 
 
 @app.get("/tracing/trace/{trace_id}")
-def get_trace(trace_id: str):
+async def get_trace(trace_id: str):
     """Get all spans for a specific trace ID."""
-    spans = get_trace_by_id(trace_id)
-    return {"trace_id": trace_id, "spans": spans}
+    return Response(
+        content=b'{"trace_id":' + orjson.dumps(trace_id) + b',"spans":' + get_trace_by_id_json(trace_id) + b'}',
+        media_type="application/json"
+    )
 
 
 @app.post("/tracing/clear")
@@ -1362,13 +1716,13 @@ def clear_traces():
 # -- Performance Budget Endpoints --
 
 @app.get("/performance/stats")
-def performance_statistics():
+async def performance_statistics():
     """Get performance statistics and budget compliance."""
     return get_performance_stats()
 
 
 @app.get("/performance/violations")
-def performance_violations(limit: int = 50):
+async def performance_violations(limit: int = 50):
     """Get recent performance budget violations."""
     return {"violations": get_budget_violations(limit)}
 
@@ -1398,32 +1752,32 @@ def secrets_access_log(limit: int = 50):
 # PHASE 4: SYSTEM INFO & VERSION
 # ============================================================================
 
+APP_ROUTE_COUNT = 0
+
+PHASE4_FEATURES = {
+    "security": ["jwt", "rbac", "rate_limiting", "audit"],
+    "resilience": ["circuit_breakers", "retry", "dlq", "degradation"],
+    "observability": ["metrics", "tracing", "logging", "alerting"],
+    "compliance": ["gdpr", "pdpa", "consent", "pii_handling"],
+    "performance": ["caching", "budgets", "monitoring"],
+    "disaster_recovery": ["backups", "restore"]
+}
+
+
 @app.get("/system/info")
-def system_info():
+async def system_info():
     """
     Get comprehensive system information.
     Single endpoint for operational dashboards.
+    Resource figures come from the background sampler.
     """
-    import psutil
-    
     return {
         "version": "2.0.0-phase4",
         "service": "resortOS-core",
         "timestamp": datetime.utcnow().isoformat() + "Z",
-        "phase4_features": {
-            "security": ["jwt", "rbac", "rate_limiting", "audit"],
-            "resilience": ["circuit_breakers", "retry", "dlq", "degradation"],
-            "observability": ["metrics", "tracing", "logging", "alerting"],
-            "compliance": ["gdpr", "pdpa", "consent", "pii_handling"],
-            "performance": ["caching", "budgets", "monitoring"],
-            "disaster_recovery": ["backups", "restore"]
-        },
-        "resources": {
-            "cpu_percent": psutil.cpu_percent(),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage('/').percent
-        },
-        "endpoints_count": len(app.routes)
+        "phase4_features": PHASE4_FEATURES,
+        "resources": get_system_resources(),
+        "endpoints_count": APP_ROUTE_COUNT
     }
 
 
@@ -1479,7 +1833,7 @@ async def demo_trigger_scenario(scenario_id: str):
         raise HTTPException(status_code=400, detail=result["error"])
     
     # Also emit to Socket.IO for real-time feed
-    await sio.emit('new_message', data=result["message"])
+    _spawn(_emit('new_message', result["message"]))
     
     return result
 
@@ -1493,7 +1847,7 @@ async def demo_trigger_random():
         raise HTTPException(status_code=400, detail=result["error"])
     
     # Emit to Socket.IO
-    await sio.emit('new_message', data=result["message"])
+    _spawn(_emit('new_message', result["message"]))
     
     return result
 
@@ -1,11 +1,71 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Text, Integer, Float, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Text, Integer, Float, Boolean, Index, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, relationship
-from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+import os
+import time
 import uuid
 
 Base = declarative_base()
 
 
+def new_id() -> str:
+    """
+    Time-ordered UUIDv7 string (RFC 9562): 48-bit unix ms timestamp, then
+    random bits. New primary keys land at the right edge of the B-tree
+    instead of splitting random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time as a naive timestamp, evaluated by the database.
+    Used for server-side timestamp defaults instead of datetime.utcnow.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
+
+class utcclock(utcnow):
+    """
+    utcnow() read from the wall clock at INSERT time. On PostgreSQL
+    CURRENT_TIMESTAMP is the transaction start, so rows written in one
+    transaction (batched message inserts) would all share one value.
+    """
+    inherit_cache = True
+
+
+@compiles(utcclock, "postgresql")
+def _pg_utcclock(element, compiler, **kw):
+    return "TIMEZONE('utc', clock_timestamp())"
+
+
+@compiles(utcclock)
+def _default_utcclock(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+# JSON on SQLite (local dev), binary JSONB on PostgreSQL so containment
+# queries (@>) can be served from a GIN index.
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+
 # ============================================================================
 # PHASE 4: User Authentication Model
 # ============================================================================
@@ -13,8 +73,12 @@ Base = declarative_base()
 class UserModel(Base):
     """Staff users for authentication and RBAC."""
     __tablename__ = "users"
+    __table_args__ = (
+        # list_users(resort_id=...) and per-resort active staff lookups
+        Index("ix_users_resort_active", "resort_id", "is_active"),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     email = Column(String, unique=True, nullable=False, index=True)
     hashed_password = Column(String, nullable=False)
     name = Column(String, nullable=True)
@@ -24,32 +88,42 @@ class UserModel(Base):
     permissions = Column(JSON, default=list)  # Additional granular permissions
     
     # Multi-tenancy
-    resort_id = Column(String, nullable=True, index=True)  # NULL = all resorts access
+    resort_id = Column(String, nullable=True)  # NULL = all resorts access
     
     # Security tracking
     is_active = Column(Boolean, default=True)
     last_login = Column(DateTime, nullable=True)
     failed_login_attempts = Column(Integer, default=0)
     locked_until = Column(DateTime, nullable=True)
-    password_changed_at = Column(DateTime, default=datetime.utcnow)
+    password_changed_at = Column(DateTime, server_default=utcnow())
     
     # Audit
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
     created_by = Column(String, nullable=True)
 
 
 class GuestModel(Base):
     __tablename__ = "guests"
-    
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Only @> is used for channel lookups, so jsonb_path_ops keeps the index small
+        Index(
+            "guests_channel_ids_gin", "channel_ids",
+            postgresql_using="gin",
+            postgresql_ops={"channel_ids": "jsonb_path_ops"}
+        ),
+        # Retention sweep selects guests by created_at cutoff per period
+        Index("ix_guests_created_retention", "created_at"),
+    )
+    
+    id = Column(String, primary_key=True, default=new_id)
     name = Column(String, nullable=True)
     phone = Column(String, nullable=True)
     email = Column(String, nullable=True)
     # Store channel_ids as JSON: {"whatsapp": "+123", "line": "U123"}
-    channel_ids = Column(JSON, default=dict) 
+    channel_ids = Column(JSONType, default=dict)
     language = Column(String, default="en")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
     
     # PHASE 4: GDPR/PDPA Compliance Fields
     consent_marketing = Column(Boolean, default=False)
@@ -64,15 +138,22 @@ class GuestModel(Base):
     country_code = Column(String(2), nullable=True)  # ISO 3166-1 alpha-2
     
     messages = relationship("MessageModel", back_populates="guest")
+    threads = relationship("ThreadModel", back_populates="guest")
 
 class ThreadModel(Base):
     __tablename__ = "threads"
-    
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # SLA monitor and dashboard counts filter active threads by SLA colour
+        Index("ix_threads_status_sla", "status", "sla_status"),
+        # Guest export/deletion and GuestModel.threads load by guest
+        Index("ix_threads_guest", "guest_id"),
+    )
+    
+    id = Column(String, primary_key=True, default=new_id)
     guest_id = Column(String, ForeignKey("guests.id"), nullable=True)
     status = Column(String, default="active") # active, closed, pending_agent
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow())
     
     # SLA Tracking fields
     last_guest_message = Column(DateTime, nullable=True)
@@ -80,12 +161,32 @@ class ThreadModel(Base):
     sla_status = Column(String, default="green")  # green, yellow, red
     sla_breached = Column(Boolean, default=False)
     
+    guest = relationship("GuestModel", back_populates="threads")
     messages = relationship("MessageModel", back_populates="thread")
 
 class MessageModel(Base):
     __tablename__ = "messages"
-    
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Thread history reads are "latest N for thread" -> no sort node
+        Index("messages_thread_ts_desc", "thread_id", text("timestamp DESC")),
+        # Compliance lookups by PII category; partial so non-PII writes skip it
+        Index(
+            "ix_messages_pii_gin", "pii_categories",
+            postgresql_using="gin",
+            postgresql_ops={"pii_categories": "jsonb_path_ops"},
+            postgresql_where=text("contains_pii")
+        ),
+        # Rows arrive in timestamp order, so a BRIN index gives time-range
+        # scans (retention, exports by date) partition-like block skipping
+        # for a few pages of index. Not declaratively partitioned: that
+        # would force (id, timestamp) as the PK and break the
+        # copilot_suggestions.message_id foreign key.
+        Index("ix_messages_ts_brin", "timestamp", postgresql_using="brin"),
+        # Export, anonymization, deletion and retention counts all filter by guest
+        Index("ix_messages_guest_thread", "guest_id", "thread_id"),
+    )
+    
+    id = Column(String, primary_key=True, default=new_id)
     thread_id = Column(String, ForeignKey("threads.id"), nullable=True)
     guest_id = Column(String, ForeignKey("guests.id"), nullable=True)
     
@@ -97,13 +198,16 @@ class MessageModel(Base):
     content_type = Column(String) # text, image
     body = Column(Text)
     media_url = Column(String, nullable=True)
-    metadata_json = Column(JSON, default=dict)
+    # No Python-side default: rows without metadata omit the column and take '{}'
+    metadata_json = Column(JSONType, server_default=text("'{}'"))
     
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    # Per-row clock: one batch commits many messages, and thread order
+    # (messages_thread_ts_desc) depends on distinct timestamps
+    timestamp = Column(DateTime, server_default=utcclock())
     
     # PHASE 4: PII tracking
     contains_pii = Column(Boolean, default=False)
-    pii_categories = Column(JSON, default=list)  # ["email", "phone", "address"]
+    pii_categories = Column(JSONType, default=list)  # ["email", "phone", "address"]
     
     guest = relationship("GuestModel", back_populates="messages")
     thread = relationship("ThreadModel", back_populates="messages")
@@ -117,7 +221,7 @@ class KnowledgeDocument(Base):
     """Tracks uploaded SOPs and knowledge documents."""
     __tablename__ = "knowledge_documents"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     filename = Column(String, nullable=False)
     file_type = Column(String, default="pdf")  # pdf, txt, md
     title = Column(String, nullable=True)
@@ -129,7 +233,7 @@ class KnowledgeDocument(Base):
     status = Column(String, default="pending")  # pending, processing, ready, error
     error_message = Column(Text, nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
     processed_at = Column(DateTime, nullable=True)
     
     chunks = relationship("KnowledgeChunk", back_populates="document")
@@ -139,7 +243,7 @@ class KnowledgeChunk(Base):
     """Individual chunks of knowledge documents for RAG retrieval."""
     __tablename__ = "knowledge_chunks"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     document_id = Column(String, ForeignKey("knowledge_documents.id"), nullable=False)
     
     # Content
@@ -151,7 +255,7 @@ class KnowledgeChunk(Base):
     embedding_id = Column(String, nullable=True)  # ChromaDB ID
     token_count = Column(Integer, default=0)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
     
     document = relationship("KnowledgeDocument", back_populates="chunks")
 
@@ -160,7 +264,7 @@ class CopilotSuggestion(Base):
     """Tracks AI suggestions for analytics and feedback."""
     __tablename__ = "copilot_suggestions"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     thread_id = Column(String, ForeignKey("threads.id"), nullable=True)
     message_id = Column(String, ForeignKey("messages.id"), nullable=True)
     
@@ -175,7 +279,7 @@ class CopilotSuggestion(Base):
     was_used = Column(Boolean, nullable=True)
     agent_rating = Column(Integer, nullable=True)  # 1-5 rating
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 # ============================================================================
@@ -185,8 +289,12 @@ class CopilotSuggestion(Base):
 class DataDeletionRequest(Base):
     """Tracks GDPR/PDPA data deletion (right to be forgotten) requests."""
     __tablename__ = "data_deletion_requests"
+    __table_args__ = (
+        # Compliance status counts pending and overdue (pending, past deadline) requests
+        Index("ix_deletion_requests_status_deadline", "status", "deadline"),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     guest_id = Column(String, ForeignKey("guests.id"), nullable=False)
     
     # Request details
@@ -203,14 +311,18 @@ class DataDeletionRequest(Base):
     deadline = Column(DateTime, nullable=True)  # GDPR: 30 days
     notes = Column(Text, nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 class ConsentLog(Base):
     """Audit log for consent changes (GDPR Article 7 compliance)."""
     __tablename__ = "consent_logs"
+    __table_args__ = (
+        # Consent history is read per guest, newest first (backward index scan)
+        Index("ix_consentlog_guest_created", "guest_id", "created_at"),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     guest_id = Column(String, ForeignKey("guests.id"), nullable=False)
     
     consent_type = Column(String, nullable=False)  # marketing, analytics, necessary
@@ -223,6 +335,59 @@ class ConsentLog(Base):
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+
+
+
+
+
+# ============================================================================
+# SCHEMA UPGRADES (PostgreSQL)
+# ============================================================================
+# create_all() only creates missing tables; it never alters existing ones.
+# These idempotent statements bring older databases up to the current model
+# and are run once at startup (see main.py _apply_schema_upgrades), each in
+# its own autocommit transaction so indexes can be built CONCURRENTLY without
+# blocking writes; a failing statement is logged and the rest still run.
+
+def _json_to_jsonb(table: str, column: str) -> str:
+    return f"""
+DO $$ BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = '{table}' AND column_name = '{column}') = 'json' THEN
+        ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb;
+    END IF;
+END $$;"""
+
+
+def _utc_default_upgrades() -> list:
+    """SET DEFAULT for every column whose model default is utcnow() (or utcclock())."""
+    dialect = postgresql.dialect()
+    return [
+        f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" SET DEFAULT '
+        f'{column.server_default.arg.compile(dialect=dialect)}'
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if column.server_default is not None and isinstance(column.server_default.arg, utcnow)
+    ]
 
 
+POSTGRES_SCHEMA_UPGRADES = [
+    _json_to_jsonb("guests", "channel_ids"),
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS guests_channel_ids_gin ON guests USING GIN (channel_ids jsonb_path_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_thread_ts_desc ON messages (thread_id, timestamp DESC)",
+    _json_to_jsonb("messages", "metadata_json"),
+    "ALTER TABLE messages ALTER COLUMN metadata_json SET DEFAULT '{}'::jsonb",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_resort_active ON users (resort_id, is_active)",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_users_resort_id",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_threads_status_sla ON threads (status, sla_status)",
+    _json_to_jsonb("messages", "pii_categories"),
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_pii_gin ON messages USING GIN (pii_categories jsonb_path_ops) WHERE contains_pii",
+    *_utc_default_upgrades(),
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_ts_brin ON messages USING BRIN ("timestamp")',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deletion_requests_status_deadline ON data_deletion_requests (status, deadline)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_guest_thread ON messages (guest_id, thread_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_threads_guest ON threads (guest_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_consentlog_guest_created ON consent_logs (guest_id, created_at)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_guests_created_retention ON guests (created_at)",
+]
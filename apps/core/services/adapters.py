@@ -11,10 +11,11 @@ Handles webhook normalization for all messaging channels:
 
 No external dependencies - runs in-process with Core.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Dict, Literal, Any
 from datetime import datetime
-import uuid
+
+from models import new_id
 
 
 # ============================================================================
@@ -23,7 +24,9 @@ import uuid
 
 class Guest(BaseModel):
     """Guest profile from messaging channel."""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(frozen=True)
+    
+    id: str = Field(default_factory=new_id)
     name: Optional[str] = None
     phone: Optional[str] = None
     email: Optional[str] = None
@@ -34,6 +37,8 @@ class Guest(BaseModel):
 
 class MessageContent(BaseModel):
     """Normalized message content."""
+    model_config = ConfigDict(frozen=True)
+    
     type: Literal["text", "image", "location", "template"]
     body: str
     media_url: Optional[str] = None
@@ -45,7 +50,9 @@ class UnifiedMessage(BaseModel):
     Standard message format for all channels.
     This is the canonical format used throughout the system.
     """
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    model_config = ConfigDict(frozen=True)
+    
+    id: str = Field(default_factory=new_id)
     thread_id: Optional[str] = None
     channel: Literal["whatsapp", "line", "wechat", "kakao", "web"]
     direction: Literal["inbound", "outbound"]
@@ -53,12 +60,42 @@ class UnifiedMessage(BaseModel):
     content: MessageContent
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     guest: Optional[Guest] = None
+    
+    def to_event(self) -> Dict[str, Any]:
+        """
+        Event bus payload: the same shape as model_dump(), built from the
+        field dicts. Nested values (e.g. the raw webhook in content.metadata)
+        are shared rather than deep-copied; the models are frozen.
+        """
+        event = dict(self.__dict__)
+        event["content"] = dict(self.content.__dict__)
+        if self.guest is not None:
+            event["guest"] = dict(self.guest.__dict__)
+        return event
 
 
 # ============================================================================
 # WHATSAPP ADAPTER
 # ============================================================================
 
+def _twilio_fields(webhook_data: dict) -> tuple:
+    """(body, sender) from a Twilio form payload."""
+    body = webhook_data.get("Body") or str(webhook_data)
+    sender = webhook_data.get("From") or webhook_data.get("WaId") or "unknown"
+    return body, sender
+
+
+def _meta_fields(webhook_data: dict) -> tuple:
+    """(body, sender) from a Meta Graph API / generic JSON payload."""
+    body = webhook_data.get("body")
+    if not body:
+        message = webhook_data.get("message")
+        text = message.get("text") if isinstance(message, dict) else None
+        body = (text.get("body") if isinstance(text, dict) else None) or str(webhook_data)
+    sender = webhook_data.get("from") or webhook_data.get("sender_id") or "unknown"
+    return body, sender
+
+
 class WhatsAppAdapter:
     """
     Adapter for WhatsApp webhooks (Twilio or Meta Graph API).
@@ -72,25 +109,12 @@ class WhatsAppAdapter:
         
         Handles both Twilio and Meta Graph API formats.
         """
-        # Extract body from various possible locations
-        body = (
-            webhook_data.get("body") or 
-            webhook_data.get("message", {}).get("text", {}).get("body") or 
-            webhook_data.get("Body") or  # Twilio format
-            str(webhook_data)
-        )
+        # Twilio posts capitalised form fields; everything else is Meta-style JSON
+        extract = _twilio_fields if "Body" in webhook_data else _meta_fields
+        body, sender = extract(webhook_data)
         
-        # Extract sender ID
-        sender = (
-            webhook_data.get("from") or 
-            webhook_data.get("sender_id") or
-            webhook_data.get("From") or  # Twilio format
-            webhook_data.get("WaId") or  # Twilio WhatsApp ID
-            "unknown"
-        )
-        
-        # Clean phone number format
-        if sender.startswith("whatsapp:"):
+        # Clean phone number format (non-string senders are rejected below)
+        if isinstance(sender, str) and sender.startswith("whatsapp:"):
             sender = sender.replace("whatsapp:", "")
         
         content = MessageContent(
@@ -126,6 +150,19 @@ class WhatsAppAdapter:
 # LINE ADAPTER
 # ============================================================================
 
+def _line_location_body(message: dict) -> str:
+    title = message.get("title", "Location")
+    address = message.get("address", "")
+    return f"📍 {title}: {address}"
+
+
+# LINE message type -> (content type, body builder)
+_LINE_MESSAGE_TYPES = {
+    "text": ("text", lambda message: message.get("text", "")),
+    "image": ("image", lambda message: "[Image]"),
+    "location": ("location", _line_location_body),
+}
+
 class LineAdapter:
     """
     Adapter for LINE Messaging API webhooks.
@@ -171,21 +208,11 @@ class LineAdapter:
         
         # Determine content type and body
         msg_type = message.get("type", "text")
-        
-        if msg_type == "text":
-            body = message.get("text", "")
-            content_type = "text"
-        elif msg_type == "image":
-            body = "[Image]"
-            content_type = "image"
-        elif msg_type == "location":
-            title = message.get("title", "Location")
-            address = message.get("address", "")
-            body = f"📍 {title}: {address}"
-            content_type = "location"
+        handler = _LINE_MESSAGE_TYPES.get(msg_type)
+        if handler:
+            content_type, body = handler[0], handler[1](message)
         else:
-            body = f"[{msg_type}]"
-            content_type = "text"
+            content_type, body = "text", f"[{msg_type}]"
         
         content = MessageContent(
             type=content_type,
@@ -271,6 +298,9 @@ ADAPTERS = {
     "web": WebAdapter,
 }
 
+# Channel -> bound normalize function, resolved once for the webhook hot path
+_NORMALIZERS = {channel: adapter.normalize for channel, adapter in ADAPTERS.items()}
+
 
 def get_adapter(channel: str):
     """Get adapter for a specific channel."""
@@ -291,5 +321,8 @@ def normalize_message(channel: str, webhook_data: dict) -> UnifiedMessage:
     Returns:
         Normalized UnifiedMessage
     """
-    adapter = get_adapter(channel)
-    return adapter.normalize(webhook_data)
+    try:
+        normalize = _NORMALIZERS[channel]
+    except KeyError:
+        raise ValueError(f"No adapter for channel: {channel}")
+    return normalize(webhook_data)
@@ -15,12 +15,18 @@ Features:
 """
 import os
 import time
-import json
-import hashlib
+import orjson
+import threading
+import heapq
+from fnmatch import fnmatchcase
+import weakref
 from datetime import datetime, timedelta
 from typing import Any, Optional, Dict, List, Callable
 from functools import wraps
-from collections import OrderedDict
+
+from sqlalchemy import select
+
+from models import GuestModel
 
 # ============================================================================
 # CONFIGURATION
@@ -32,23 +38,40 @@ L2_DEFAULT_TTL = int(os.getenv("L2_CACHE_TTL", "300"))  # 5 minutes
 
 # Redis connection (reuse from app)
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+# Connections per worker, shared by every L2Cache
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+# Pattern invalidation: SCAN page size and keys per pipelined UNLINK
+L2_SCAN_COUNT = int(os.getenv("L2_SCAN_COUNT", "10000"))
+L2_UNLINK_BATCH = int(os.getenv("L2_UNLINK_BATCH", "500"))
 
 
 # ============================================================================
 # L1: IN-MEMORY CACHE (Per Instance)
 # ============================================================================
 
+_NS_PER_SECOND = 1_000_000_000
+
+
 class L1Cache:
     """
-    Fast in-memory cache using OrderedDict for LRU eviction.
+    Fast in-memory cache on a plain dict (insertion-ordered) for LRU eviction.
     Per-instance, no sharing between replicas.
+    
+    Each entry is stored as key -> (value, expires_at) with integer
+    monotonic_ns expiry times, so a lookup is a single dict probe. A
+    min-heap of (expires_at, key) lets the expiry sweep stop at the first
+    live entry instead of scanning the whole cache. Lookups take no lock;
+    LRU promotion, writes and evictions are serialized by a short write lock.
     """
     
     def __init__(self, max_size: int = L1_MAX_SIZE, default_ttl: int = L1_DEFAULT_TTL):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self._cache: OrderedDict = OrderedDict()
-        self._expires: Dict[str, float] = {}
+        self._cache: Dict[str, tuple] = {}
+        # Lazily pruned: overwritten/evicted keys leave stale heap entries
+        self._expiry_heap: List[tuple] = []
+        self._write_lock = threading.Lock()
         self._stats = {
             "hits": 0,
             "misses": 0,
@@ -56,67 +79,107 @@ class L1Cache:
             "sets": 0
         }
     
-    def _is_expired(self, key: str) -> bool:
-        if key not in self._expires:
-            return True
-        return time.time() > self._expires[key]
-    
     def _evict_expired(self):
-        """Remove expired entries."""
-        now = time.time()
-        expired_keys = [k for k, exp in self._expires.items() if now > exp]
-        for key in expired_keys:
-            self._cache.pop(key, None)
-            self._expires.pop(key, None)
+        """Remove expired entries (O(k log n) for k heap entries past expiry)."""
+        now = time.monotonic_ns()
+        with self._write_lock:
+            cache = self._cache
+            heap = self._expiry_heap
+            while heap and heap[0][0] < now:
+                expires_at, key = heapq.heappop(heap)
+                entry = cache.get(key)
+                # Skip stale heap entries for keys since re-set or evicted
+                if entry is not None and entry[1] == expires_at:
+                    del cache[key]
+    
+    def _compact_expiry_heap(self):
+        """Rebuild the heap from live entries once stale ones dominate."""
+        if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [(exp, key) for key, (_, exp) in self._cache.items()]
+            heapq.heapify(self._expiry_heap)
     
     def _enforce_size_limit(self):
         """Evict oldest entries if over size limit."""
-        while len(self._cache) > self.max_size:
-            oldest_key, _ = self._cache.popitem(last=False)
-            self._expires.pop(oldest_key, None)
+        cache = self._cache
+        while len(cache) > self.max_size:
+            del cache[next(iter(cache))]
             self._stats["evictions"] += 1
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache, returns None if not found or expired."""
-        if key not in self._cache or self._is_expired(key):
+        entry = self._cache.get(key)
+        if entry is None or time.monotonic_ns() > entry[1]:
             self._stats["misses"] += 1
-            if key in self._cache:
-                del self._cache[key]
-                del self._expires[key]
+            if entry is not None:
+                self.delete(key)
             return None
         
-        # Move to end (most recently used)
-        self._cache.move_to_end(key)
+        # Re-insert to mark most recently used, unless a concurrent
+        # write or eviction already replaced or dropped the entry. Best
+        # effort: a hit never waits on the write lock, it skips promotion
+        if self._write_lock.acquire(blocking=False):
+            try:
+                cache = self._cache
+                if cache.get(key) is entry:
+                    del cache[key]
+                    cache[key] = entry
+            finally:
+                self._write_lock.release()
         self._stats["hits"] += 1
-        return self._cache[key]
+        return entry[0]
     
     def set(self, key: str, value: Any, ttl: int = None):
         """Set value in cache with TTL."""
         ttl = ttl or self.default_ttl
         
-        # Remove old entry if exists
-        if key in self._cache:
-            del self._cache[key]
-        
-        self._cache[key] = value
-        self._expires[key] = time.time() + ttl
-        self._stats["sets"] += 1
+        with self._write_lock:
+            # Remove old entry so the key moves to the newest position
+            expires_at = time.monotonic_ns() + ttl * _NS_PER_SECOND
+            self._cache.pop(key, None)
+            self._cache[key] = (value, expires_at)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._stats["sets"] += 1
+            
+            # Enforce size limit
+            self._enforce_size_limit()
+            self._compact_expiry_heap()
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = None):
+        """Set several values under one write lock, sharing one expiry time."""
+        ttl = ttl or self.default_ttl
         
-        # Enforce size limit
-        self._enforce_size_limit()
+        with self._write_lock:
+            cache = self._cache
+            heap = self._expiry_heap
+            expires_at = time.monotonic_ns() + ttl * _NS_PER_SECOND
+            for key, value in items.items():
+                cache.pop(key, None)
+                cache[key] = (value, expires_at)
+                heapq.heappush(heap, (expires_at, key))
+            self._stats["sets"] += len(items)
+            
+            self._enforce_size_limit()
+            self._compact_expiry_heap()
     
     def delete(self, key: str) -> bool:
         """Delete key from cache."""
-        if key in self._cache:
-            del self._cache[key]
-            del self._expires[key]
-            return True
-        return False
+        with self._write_lock:
+            return self._cache.pop(key, None) is not None
     
     def clear(self):
-        """Clear all cache entries."""
-        self._cache.clear()
-        self._expires.clear()
+        """Clear all cache entries (swaps in an empty store instead of emptying in place)."""
+        with self._write_lock:
+            self._cache = {}
+            self._expiry_heap = []
+    
+    def invalidate_pattern(self, pattern: str) -> int:
+        """Delete keys matching a Redis-style glob pattern (*, ?, [...])."""
+        with self._write_lock:
+            cache = self._cache
+            matched = [key for key in cache if fnmatchcase(key, pattern)]
+            for key in matched:
+                del cache[key]
+        return len(matched)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
@@ -144,10 +207,36 @@ _l1_cache = L1Cache()
 # L2: REDIS CACHE (Shared Across Instances)
 # ============================================================================
 
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+
+def _get_redis_pool():
+    """Process-wide Redis connection pool, created on first use."""
+    global _redis_pool
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                import redis
+                _redis_pool = redis.ConnectionPool.from_url(
+                    REDIS_URL,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    decode_responses=True,
+                    socket_keepalive=True,
+                    health_check_interval=30
+                )
+    return _redis_pool
+
+
+def _dumps(value: Any) -> bytes:
+    # OPT_NON_STR_KEYS matches json.dumps, which coerced int keys to strings
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
 class L2Cache:
     """
     Redis-backed cache for sharing across service instances.
-    Provides distributed caching with JSON serialization.
+    Provides distributed caching with JSON serialization (orjson).
     """
     
     def __init__(self, default_ttl: int = L2_DEFAULT_TTL, prefix: str = "cache:"):
@@ -162,11 +251,11 @@ class L2Cache:
         }
     
     def _get_redis(self):
-        """Lazy load Redis connection."""
+        """Lazy load Redis client on the shared connection pool."""
         if self._redis is None:
             try:
                 import redis
-                self._redis = redis.from_url(REDIS_URL, decode_responses=True)
+                self._redis = redis.Redis(connection_pool=_get_redis_pool())
             except Exception as e:
                 print(f"⚠️ L2 Cache Redis connection failed: {e}")
                 return None
@@ -188,12 +277,34 @@ class L2Cache:
                 return None
             
             self._stats["hits"] += 1
-            return json.loads(value)
+            return orjson.loads(value)
         except Exception as e:
             self._stats["errors"] += 1
             print(f"⚠️ L2 Cache get error: {e}")
             return None
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several values in one MGET round-trip; misses are omitted."""
+        r = self._get_redis()
+        if not r or not keys:
+            return {}
+        
+        try:
+            raw_values = r.mget([self._make_key(key) for key in keys])
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"⚠️ L2 Cache get_many error: {e}")
+            return {}
+        
+        found = {
+            key: orjson.loads(raw)
+            for key, raw in zip(keys, raw_values)
+            if raw is not None
+        }
+        self._stats["hits"] += len(found)
+        self._stats["misses"] += len(keys) - len(found)
+        return found
+    
     def set(self, key: str, value: Any, ttl: int = None):
         """Set value in Redis cache with TTL."""
         r = self._get_redis()
@@ -203,7 +314,7 @@ class L2Cache:
         ttl = ttl or self.default_ttl
         
         try:
-            serialized = json.dumps(value)
+            serialized = _dumps(value)
             r.setex(self._make_key(key), ttl, serialized)
             self._stats["sets"] += 1
             return True
@@ -212,6 +323,26 @@ class L2Cache:
             print(f"⚠️ L2 Cache set error: {e}")
             return False
     
+    def set_many(self, items: Dict[str, Any], ttl: int = None) -> bool:
+        """Set several values in one pipelined round-trip."""
+        r = self._get_redis()
+        if not r or not items:
+            return False
+        
+        ttl = ttl or self.default_ttl
+        
+        try:
+            pipe = r.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(self._make_key(key), ttl, _dumps(value))
+            pipe.execute()
+            self._stats["sets"] += len(items)
+            return True
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"⚠️ L2 Cache set_many error: {e}")
+            return False
+    
     def delete(self, key: str) -> bool:
         """Delete key from Redis cache."""
         r = self._get_redis()
@@ -230,10 +361,18 @@ class L2Cache:
             return 0
         
         try:
-            keys = r.keys(self._make_key(pattern))
-            if keys:
-                return r.delete(*keys)
-            return 0
+            # SCAN walks the keyspace incrementally (KEYS blocks Redis for the
+            # whole walk); UNLINK frees values in a background thread
+            deleted = 0
+            batch = []
+            for key in r.scan_iter(match=self._make_key(pattern), count=L2_SCAN_COUNT):
+                batch.append(key)
+                if len(batch) >= L2_UNLINK_BATCH:
+                    deleted += r.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += r.unlink(*batch)
+            return deleted
         except Exception as e:
             print(f"⚠️ L2 Cache pattern invalidation error: {e}")
             return 0
@@ -281,6 +420,9 @@ class MultiLayerCache:
     def __init__(self, l1: L1Cache = None, l2: L2Cache = None):
         self.l1 = l1 or _l1_cache
         self.l2 = l2 or _l2_cache
+        # Per-key compute locks, dropped automatically once no thread holds them
+        self._key_locks = weakref.WeakValueDictionary()
+        self._key_locks_guard = threading.Lock()
     
     def get(self, key: str, use_l2: bool = True) -> Optional[Any]:
         """
@@ -302,12 +444,72 @@ class MultiLayerCache:
         
         return None
     
+    def get_many(self, keys: List[str], use_l2: bool = True) -> Dict[str, Any]:
+        """
+        Get several values: L1 first, then one MGET to L2 for the misses.
+        Promotes L2 hits to L1. Keys not found in either layer are omitted.
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        
+        if use_l2 and missing:
+            for key, value in self.l2.get_many(missing).items():
+                self.l1.set(key, value)
+                found[key] = value
+        
+        return found
+    
     def set(self, key: str, value: Any, l1_ttl: int = None, l2_ttl: int = None, use_l2: bool = True):
         """Set value in L1 and optionally L2."""
         self.l1.set(key, value, l1_ttl)
         if use_l2:
             self.l2.set(key, value, l2_ttl)
     
+    def set_many(self, items: Dict[str, Any], l1_ttl: int = None, l2_ttl: int = None, use_l2: bool = True):
+        """Set several values in L1 (one lock) and L2 (one pipeline)."""
+        self.l1.set_many(items, l1_ttl)
+        if use_l2:
+            self.l2.set_many(items, l2_ttl)
+    
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        l1_ttl: int = None,
+        l2_ttl: int = None,
+        use_l2: bool = True
+    ) -> Any:
+        """
+        Get value, or compute and cache it on a miss.
+        Single-flight: concurrent misses on the same key run compute() once
+        and the other callers wait for that result.
+        """
+        value = self.get(key, use_l2=use_l2)
+        if value is not None:
+            return value
+        
+        with self._key_locks_guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+        
+        with lock:
+            # Another caller may have filled it while we waited
+            value = self.get(key, use_l2=use_l2)
+            if value is not None:
+                return value
+            value = compute()
+            if value is not None:
+                self.set(key, value, l1_ttl=l1_ttl, l2_ttl=l2_ttl, use_l2=use_l2)
+            return value
+    
     def delete(self, key: str, use_l2: bool = True) -> bool:
         """Delete from both cache layers."""
         l1_result = self.l1.delete(key)
@@ -315,9 +517,10 @@ class MultiLayerCache:
         return l1_result or l2_result
     
     def invalidate_pattern(self, pattern: str) -> int:
-        """Invalidate L2 keys matching pattern and clear L1."""
-        self.l1.clear()
-        return self.l2.invalidate_pattern(pattern)
+        """Invalidate keys matching pattern in both layers (L1 keeps the rest)."""
+        l1_deleted = self.l1.invalidate_pattern(pattern)
+        l2_deleted = self.l2.invalidate_pattern(pattern)
+        return max(l1_deleted, l2_deleted)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get combined cache statistics."""
@@ -335,6 +538,16 @@ cache = MultiLayerCache()
 # CACHE DECORATORS
 # ============================================================================
 
+def _make_cache_key(key_prefix: str, args: tuple, kwargs: dict) -> str:
+    """
+    Build the cache key from prefix + args. The joined string is used as-is
+    (dicts hash it in C); digesting it first only added per-call overhead.
+    """
+    key_parts = [key_prefix] + [str(a) for a in args]
+    key_parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
+    return ":".join(key_parts)
+
+
 def cached(key_prefix: str, ttl: int = 60, use_l2: bool = True):
     """
     Decorator to cache function results.
@@ -347,29 +560,18 @@ def cached(key_prefix: str, ttl: int = 60, use_l2: bool = True):
     def decorator(func: Callable):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Build cache key from prefix + args
-            key_parts = [key_prefix] + [str(a) for a in args]
-            key_parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
-            cache_key = hashlib.md5(":".join(key_parts).encode()).hexdigest()
-            
-            # Try cache first
-            result = cache.get(cache_key, use_l2=use_l2)
-            if result is not None:
-                return result
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            if result is not None:
-                cache.set(cache_key, result, l1_ttl=ttl, l2_ttl=ttl * 2, use_l2=use_l2)
-            
-            return result
+            # Try cache first; on a miss, execute once and cache the result
+            return cache.get_or_compute(
+                _make_cache_key(key_prefix, args, kwargs),
+                lambda: func(*args, **kwargs),
+                l1_ttl=ttl,
+                l2_ttl=ttl * 2,
+                use_l2=use_l2
+            )
         
         # Add cache invalidation method
         def invalidate(*args, **kwargs):
-            key_parts = [key_prefix] + [str(a) for a in args]
-            key_parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
-            cache_key = hashlib.md5(":".join(key_parts).encode()).hexdigest()
-            return cache.delete(cache_key, use_l2=use_l2)
+            return cache.delete(_make_cache_key(key_prefix, args, kwargs), use_l2=use_l2)
         
         wrapper.invalidate = invalidate
         return wrapper
@@ -381,27 +583,34 @@ def cached(key_prefix: str, ttl: int = 60, use_l2: bool = True):
 # CACHE WARMING
 # ============================================================================
 
+# Max ids per IN (...) lookup when warming
+WARM_BATCH_SIZE = 1000
+
+
 def warm_guest_cache(guest_ids: List[str], db) -> Dict[str, int]:
     """
     Pre-populate cache with frequently accessed guests.
+    One IN query and one pipelined L2 write per batch of WARM_BATCH_SIZE ids.
     """
-    from models import GuestModel
     
+    unique_ids = list(dict.fromkeys(guest_ids))
     warmed = 0
-    for guest_id in guest_ids:
-        guest = db.query(GuestModel).filter(GuestModel.id == guest_id).first()
-        if guest:
-            cache.set(
-                f"guest:{guest_id}",
-                {
-                    "id": guest.id,
-                    "name": guest.name,
-                    "email": guest.email,
-                    "language": guest.language
-                },
-                l1_ttl=300,
-                l2_ttl=600
-            )
-            warmed += 1
+    for start in range(0, len(unique_ids), WARM_BATCH_SIZE):
+        batch = unique_ids[start:start + WARM_BATCH_SIZE]
+        rows = db.execute(
+            select(GuestModel.id, GuestModel.name, GuestModel.email, GuestModel.language)
+            .where(GuestModel.id.in_(batch))
+        )
+        entries = {
+            f"guest:{row.id}": {
+                "id": row.id,
+                "name": row.name,
+                "email": row.email,
+                "language": row.language
+            }
+            for row in rows
+        }
+        cache.set_many(entries, l1_ttl=300, l2_ttl=600)
+        warmed += len(entries)
     
     return {"guests_warmed": warmed, "total_requested": len(guest_ids)}
@@ -15,9 +15,22 @@ import os
 import re
 import json
 import hashlib
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from enum import Enum
+from sqlalchemy import select, insert, update, bindparam, func, and_, or_, case, distinct
+from sqlalchemy.orm import selectinload
+
+from models import GuestModel, MessageModel, ThreadModel, DataDeletionRequest, ConsentLog
+from services.observability import logger
+
+# Linear-time RE2 engine for PII scanning (no catastrophic backtracking on
+# user-submitted text); falls back to stdlib re when google-re2 is missing
+try:
+    import re2 as pii_re
+except ImportError:
+    pii_re = re
 
 # ============================================================================
 # CONFIGURATION
@@ -66,6 +79,33 @@ PII_PATTERNS = {
     "date_of_birth": r'\b(?:0?[1-9]|[12][0-9]|3[01])[\/\-](?:0?[1-9]|1[012])[\/\-](?:19|20)\d{2}\b',
 }
 
+# Compiled once at import; (?i) keeps case-insensitivity engine-agnostic
+PII_REGEXES = {
+    category: pii_re.compile(f"(?i){pattern}")
+    for category, pattern in PII_PATTERNS.items()
+}
+
+PII_REPLACEMENTS = {
+    category: f"[{category.upper()}_REDACTED]"
+    for category in PII_PATTERNS
+}
+
+# Messages read and rewritten per batch when anonymizing a guest
+ANONYMIZE_BATCH_SIZE = int(os.getenv("ANONYMIZE_BATCH_SIZE", "2000"))
+
+# Alternation order for PII_COMBINED_REGEX: the first alternative that
+# matches at a position wins, so structured formats come before the loose
+# digit run of "phone" (a 16-digit card number is also 16 digits)
+PII_MATCH_ORDER = (
+    "email", "credit_card", "ip_address", "date_of_birth", "passport", "phone", "address"
+)
+
+# All categories as one alternation so masking/anonymizing rewrites the text
+# in one pass; the matching category comes back as m.lastgroup
+PII_COMBINED_REGEX = pii_re.compile(
+    "(?i)" + "|".join(f"(?P<{category}>{PII_PATTERNS[category]})" for category in PII_MATCH_ORDER)
+)
+
 
 class RequestType(Enum):
     """Types of data subject requests."""
@@ -105,8 +145,10 @@ def detect_pii(text: str) -> Dict[str, Any]:
     categories = []
     matches = {}
     
-    for category, pattern in PII_PATTERNS.items():
-        found = re.findall(pattern, text, re.IGNORECASE)
+    # Scanned per category: a span can match more than one category (a card
+    # number is also a phone-length digit run) and each is reported
+    for category, regex in PII_REGEXES.items():
+        found = regex.findall(text)
         if found:
             categories.append(category)
             matches[category] = found
@@ -125,13 +167,21 @@ def mask_pii_in_text(text: str) -> str:
     if not text:
         return text
     
-    masked = text
+    return PII_COMBINED_REGEX.sub(lambda m: PII_REPLACEMENTS[m.lastgroup], text)
+
+
+def _pii_hasher(salt: str):
+    """Build the PII_COMBINED_REGEX.sub replacer for one salt."""
+    salt_bytes = salt.encode()
     
-    for category, pattern in PII_PATTERNS.items():
-        replacement = f"[{category.upper()}_REDACTED]"
-        masked = re.sub(pattern, replacement, masked, flags=re.IGNORECASE)
+    def hash_match(match) -> str:
+        # 4-byte BLAKE2b gives the same 8 hex chars as truncated SHA-256
+        # without computing (and discarding) the rest of a 32-byte digest
+        value = match.group(0).encode()
+        hashed = hashlib.blake2b(value + salt_bytes, digest_size=4).hexdigest()
+        return f"[ANON_{match.lastgroup.upper()}_{hashed}]"
     
-    return masked
+    return hash_match
 
 
 def anonymize_pii(text: str, salt: str = "") -> str:
@@ -142,21 +192,7 @@ def anonymize_pii(text: str, salt: str = "") -> str:
     if not text:
         return text
     
-    def hash_match(match, category: str) -> str:
-        value = match.group(0)
-        hashed = hashlib.sha256(f"{value}{salt}".encode()).hexdigest()[:8]
-        return f"[ANON_{category.upper()}_{hashed}]"
-    
-    result = text
-    for category, pattern in PII_PATTERNS.items():
-        result = re.sub(
-            pattern,
-            lambda m, c=category: hash_match(m, c),
-            result,
-            flags=re.IGNORECASE
-        )
-    
-    return result
+    return PII_COMBINED_REGEX.sub(_pii_hasher(salt), text)
 
 
 # ============================================================================
@@ -168,18 +204,24 @@ def export_guest_data(guest_id: str, db) -> Dict[str, Any]:
     Export all data for a guest in a portable format.
     GDPR Article 20 compliance.
     
-    Returns machine-readable JSON with all guest data.
+    Returns machine-readable JSON with all guest data. Timestamps are left
+    as datetime objects; orjson renders them as the same ISO 8601 strings.
     """
-    from models import GuestModel, MessageModel, ThreadModel
     
-    guest = db.query(GuestModel).filter(GuestModel.id == guest_id).first()
+    # Threads arrive in one IN (...) query with the guest
+    guest = db.query(GuestModel).options(
+        selectinload(GuestModel.threads)
+    ).filter(GuestModel.id == guest_id).first()
     
     if not guest:
         return {"error": "Guest not found", "guest_id": guest_id}
     
+    # One clock read: export_timestamp and data_exported_at must agree
+    now = datetime.utcnow()
+    
     # Export guest profile
     export_data = {
-        "export_timestamp": datetime.utcnow().isoformat() + "Z",
+        "export_timestamp": now.isoformat() + "Z",
         "export_format": "GDPR_DSAR_v1.0",
         "data_subject": {
             "id": guest.id,
@@ -188,7 +230,7 @@ def export_guest_data(guest_id: str, db) -> Dict[str, Any]:
             "phone": guest.phone,
             "language": guest.language,
             "country_code": getattr(guest, 'country_code', None),
-            "created_at": guest.created_at.isoformat() if guest.created_at else None,
+            "created_at": guest.created_at,
         },
         "consent_records": {
             "marketing": getattr(guest, 'consent_marketing', False),
@@ -200,33 +242,45 @@ def export_guest_data(guest_id: str, db) -> Dict[str, Any]:
         "threads": []
     }
     
-    # Export all messages
-    messages = db.query(MessageModel).filter(MessageModel.guest_id == guest_id).all()
-    for msg in messages:
+    # Export all messages: plain column rows streamed in batches, so only
+    # the exported dicts are kept (no ORM instances held alongside them)
+    message_rows = db.execute(
+        select(
+            MessageModel.id, MessageModel.thread_id, MessageModel.channel,
+            MessageModel.direction, MessageModel.content_type,
+            MessageModel.body, MessageModel.timestamp
+        )
+        .where(MessageModel.guest_id == guest_id)
+        .execution_options(yield_per=1000)
+    )
+    thread_counts = Counter()
+    for msg in message_rows:
+        thread_counts[msg.thread_id] += 1
         export_data["messages"].append({
             "id": msg.id,
             "channel": msg.channel,
             "direction": msg.direction,
             "content_type": msg.content_type,
             "body": msg.body,
-            "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
+            "timestamp": msg.timestamp
         })
     
     # Export thread metadata
-    threads = db.query(ThreadModel).filter(ThreadModel.guest_id == guest_id).all()
+    threads = guest.threads
     for thread in threads:
         export_data["threads"].append({
             "id": thread.id,
             "status": thread.status,
-            "created_at": thread.created_at.isoformat() if thread.created_at else None,
-            "message_count": len([m for m in messages if m.thread_id == thread.id])
+            "created_at": thread.created_at,
+            "message_count": thread_counts[thread.id]
         })
     
     # Update export timestamp on guest record
-    guest.data_exported_at = datetime.utcnow()
+    guest.data_exported_at = now
     db.commit()
     
-    print(f"📦 Data exported for guest {guest_id}: {len(messages)} messages, {len(threads)} threads")
+    logger.info("Guest data exported", guest_id=guest_id,
+                messages=len(export_data["messages"]), threads=len(threads))
     
     return export_data
 
@@ -235,6 +289,69 @@ def export_guest_data(guest_id: str, db) -> Dict[str, Any]:
 # DATA DELETION (GDPR Article 17 - Right to be Forgotten)
 # ============================================================================
 
+# Per-guest counts, built once and executed with a bound guest_id (the
+# retention sweep runs them for every expired guest)
+_COUNT_GUEST_MESSAGES = select(func.count(MessageModel.id)).where(
+    MessageModel.guest_id == bindparam("guest_id")
+)
+_COUNT_GUEST_THREADS = select(func.count(ThreadModel.id)).where(
+    ThreadModel.guest_id == bindparam("guest_id")
+)
+
+
+def _anonymize_guest_messages(db, guest_id: str, salt: str) -> int:
+    """
+    Anonymize all of a guest's messages without loading ORM objects.
+    
+    sender_id is rewritten for every message in one UPDATE. Bodies are read
+    as (id, body) in keyset pages of ANONYMIZE_BATCH_SIZE and written back
+    with one executemany UPDATE per page, skipping bodies with no PII.
+    Does not commit. Returns the number of bodies rewritten.
+    """
+    
+    db.execute(
+        update(MessageModel)
+        .where(MessageModel.guest_id == guest_id)
+        .values(sender_id=f"anon_{guest_id[:8]}")
+        .execution_options(synchronize_session=False)
+    )
+    
+    messages = MessageModel.__table__
+    write_body = (
+        messages.update()
+        .where(messages.c.id == bindparam("_id"))
+        .values(body=bindparam("_body"))
+    )
+    page = (
+        select(MessageModel.id, MessageModel.body)
+        .where(MessageModel.guest_id == guest_id, MessageModel.body.isnot(None))
+        .order_by(MessageModel.id)
+        .limit(ANONYMIZE_BATCH_SIZE)
+    )
+    
+    # One replacer for every body: the salt is fixed for the whole guest
+    hash_match = _pii_hasher(salt)
+    
+    rewritten = 0
+    last = None
+    while True:
+        stmt = page if last is None else page.where(MessageModel.id > last)
+        rows = db.execute(stmt).all()
+        
+        changes = []
+        for message_id, body in rows:
+            anonymized = PII_COMBINED_REGEX.sub(hash_match, body)
+            if anonymized != body:
+                changes.append({"_id": message_id, "_body": anonymized})
+        if changes:
+            db.execute(write_body, changes)
+            rewritten += len(changes)
+        
+        if len(rows) < ANONYMIZE_BATCH_SIZE:
+            return rewritten
+        last = rows[-1][0]
+
+
 def delete_guest_data(
     guest_id: str,
     db,
@@ -253,71 +370,73 @@ def delete_guest_data(
     
     Returns summary of deleted/anonymized data.
     """
-    from models import GuestModel, MessageModel, ThreadModel, DataDeletionRequest
     
     guest = db.query(GuestModel).filter(GuestModel.id == guest_id).first()
     
     if not guest:
         return {"error": "Guest not found", "guest_id": guest_id}
     
+    # One clock read for the result, anonymized_at, salt and audit record
+    now = datetime.utcnow()
+    
     result = {
         "guest_id": guest_id,
         "action": "hard_delete" if hard_delete else "anonymize",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": now.isoformat(),
         "messages_affected": 0,
         "threads_affected": 0
     }
     
     # Get related data counts
-    messages = db.query(MessageModel).filter(MessageModel.guest_id == guest_id).all()
-    threads = db.query(ThreadModel).filter(ThreadModel.guest_id == guest_id).all()
-    
-    result["messages_affected"] = len(messages)
-    result["threads_affected"] = len(threads)
+    params = {"guest_id": guest_id}
+    result["messages_affected"] = db.execute(_COUNT_GUEST_MESSAGES, params).scalar()
+    result["threads_affected"] = db.execute(_COUNT_GUEST_THREADS, params).scalar()
     
     if hard_delete:
-        # Permanently delete all data
-        for msg in messages:
-            db.delete(msg)
-        for thread in threads:
-            db.delete(thread)
-        db.delete(guest)
+        # Permanently delete all data: three set-based DELETEs, no rows loaded
+        db.query(MessageModel).filter(
+            MessageModel.guest_id == guest_id
+        ).delete(synchronize_session=False)
+        db.query(ThreadModel).filter(
+            ThreadModel.guest_id == guest_id
+        ).delete(synchronize_session=False)
+        db.query(GuestModel).filter(
+            GuestModel.id == guest_id
+        ).delete(synchronize_session=False)
         db.commit()
-        print(f"🗑️ Hard deleted guest {guest_id}")
+        logger.info("Guest hard deleted", guest_id=guest_id)
     else:
         # Anonymize instead of delete
-        anonymization_salt = str(datetime.utcnow().timestamp())
+        anonymization_salt = str(now.timestamp())
         
         # Anonymize guest profile
         guest.name = f"[DELETED_USER_{guest_id[:8]}]"
         guest.email = None
         guest.phone = None
         guest.channel_ids = {}
-        guest.anonymized_at = datetime.utcnow()
+        guest.anonymized_at = now
         
-        # Anonymize messages
-        for msg in messages:
-            if msg.body:
-                msg.body = anonymize_pii(msg.body, anonymization_salt)
-            msg.sender_id = f"anon_{guest_id[:8]}"
+        # Anonymize messages (batched UPDATEs, same transaction as the profile)
+        _anonymize_guest_messages(db, guest_id, anonymization_salt)
         
         db.commit()
-        print(f"🔒 Anonymized guest {guest_id}")
+        logger.info("Guest anonymized", guest_id=guest_id)
     
-    # Create deletion record for audit trail
+    # Create deletion record for audit trail (append-only: plain INSERT,
+    # no ORM object to track)
     try:
-        deletion_record = DataDeletionRequest(
+        db.execute(insert(DataDeletionRequest).values(
             guest_id=guest_id if not hard_delete else "[DELETED]",
             request_type="deletion" if hard_delete else "anonymization",
             reason=reason,
             status="completed",
-            processed_at=datetime.utcnow(),
+            processed_at=now,
             processed_by=requester_id
-        )
-        db.add(deletion_record)
+        ))
         db.commit()
     except Exception as e:
-        print(f"⚠️ Could not create deletion record: {e}")
+        db.rollback()
+        logger.warning("Could not create deletion record", guest_id=guest_id, error=str(e))
     
     return result
 
@@ -338,7 +457,6 @@ def update_consent(
     Update consent status for a guest.
     Creates audit log entry for GDPR Article 7 compliance.
     """
-    from models import GuestModel, ConsentLog
     
     guest = db.query(GuestModel).filter(GuestModel.id == guest_id).first()
     
@@ -355,10 +473,11 @@ def update_consent(
     elif consent_type == "analytics":
         guest.consent_analytics = granted
     
-    guest.consent_timestamp = datetime.utcnow()
+    now = datetime.utcnow()
+    guest.consent_timestamp = now
     
-    # Create audit log
-    log_entry = ConsentLog(
+    # Create audit log in the same transaction as the consent change
+    db.execute(insert(ConsentLog).values(
         guest_id=guest_id,
         consent_type=consent_type,
         action="granted" if granted else "withdrawn",
@@ -366,24 +485,22 @@ def update_consent(
         new_value=granted,
         source=source,
         ip_address=ip_address
-    )
-    db.add(log_entry)
+    ))
     db.commit()
     
-    print(f"🔐 Consent updated for guest {guest_id}: {consent_type} = {granted}")
+    logger.info("Consent updated", guest_id=guest_id, consent_type=consent_type, granted=granted)
     
     return {
         "guest_id": guest_id,
         "consent_type": consent_type,
         "granted": granted,
         "previous_value": previous_value,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": now.isoformat()
     }
 
 
 def get_consent_history(guest_id: str, db) -> List[Dict]:
     """Get consent change history for a guest."""
-    from models import ConsentLog
     
     logs = db.query(ConsentLog).filter(
         ConsentLog.guest_id == guest_id
@@ -415,7 +532,6 @@ def apply_retention_policy(db, dry_run: bool = True) -> Dict[str, Any]:
     
     Returns summary of affected records.
     """
-    from models import GuestModel, MessageModel
     
     now = datetime.utcnow()
     results = {
@@ -426,35 +542,40 @@ def apply_retention_policy(db, dry_run: bool = True) -> Dict[str, Any]:
         "by_region": {}
     }
     
-    # Find guests with expired retention
-    guests = db.query(GuestModel).all()
-    
-    for guest in guests:
-        retention_days = getattr(guest, 'data_retention_days', 730)
-        if not guest.created_at:
-            continue
-        
-        expiry_date = guest.created_at + timedelta(days=retention_days)
-        
-        if now > expiry_date:
-            country = getattr(guest, 'country_code', 'DEFAULT') or 'DEFAULT'
-            
-            if country not in results["by_region"]:
-                results["by_region"][country] = {"guests": 0, "messages": 0}
-            
-            results["by_region"][country]["guests"] += 1
-            results["guests_affected"] += 1
-            
-            # Count messages
-            msg_count = db.query(MessageModel).filter(
-                MessageModel.guest_id == guest.id
-            ).count()
-            results["by_region"][country]["messages"] += msg_count
-            results["messages_affected"] += msg_count
-            
-            if not dry_run:
-                # Actually anonymize expired data
-                delete_guest_data(guest.id, db, hard_delete=False, reason="retention_policy")
+    # Find guests with expired retention. Retention periods take only a few
+    # distinct values, so the per-guest "created_at + days < now" check
+    # becomes one created_at range per period, evaluated in SQL
+    retention_days = func.coalesce(GuestModel.data_retention_days, 730)
+    periods = [days for (days,) in db.query(retention_days).distinct()]
+    if not periods:
+        return results
+    
+    expired = or_(*[
+        and_(retention_days == days, GuestModel.created_at < now - timedelta(days=days))
+        for days in periods
+    ])
+    country = func.coalesce(func.nullif(GuestModel.country_code, ""), "DEFAULT")
+    
+    # Guest and message counts per region in one grouped query
+    rows = db.query(
+        country,
+        func.count(distinct(GuestModel.id)),
+        func.count(MessageModel.id)
+    ).outerjoin(
+        MessageModel, MessageModel.guest_id == GuestModel.id
+    ).filter(expired).group_by(country).all()
+    
+    for region, guest_count, msg_count in rows:
+        results["by_region"][region] = {"guests": guest_count, "messages": msg_count}
+        results["guests_affected"] += guest_count
+        results["messages_affected"] += msg_count
+    
+    if not dry_run:
+        # Actually anonymize expired data (ids collected first: each
+        # anonymization commits)
+        expired_ids = [guest_id for (guest_id,) in db.query(GuestModel.id).filter(expired)]
+        for guest_id in expired_ids:
+            delete_guest_data(guest_id, db, hard_delete=False, reason="retention_policy")
     
     return results
 
@@ -467,26 +588,20 @@ def get_compliance_status(db) -> Dict[str, Any]:
     """
     Get overall compliance status and metrics.
     """
-    from models import GuestModel, DataDeletionRequest, ConsentLog
     
     now = datetime.utcnow()
     
     # Count guests by consent status
     total_guests = db.query(GuestModel).count()
     
-    # Get pending deletion requests
-    pending_deletions = db.query(DataDeletionRequest).filter(
-        DataDeletionRequest.status == "pending"
-    ).count()
-    
-    # Overdue deletion requests (past deadline)
-    overdue = 0
-    pending_requests = db.query(DataDeletionRequest).filter(
+    # Pending deletion requests, and how many are past their deadline,
+    # counted in one query
+    pending_deletions, overdue = db.query(
+        func.count(DataDeletionRequest.id),
+        func.coalesce(func.sum(case((DataDeletionRequest.deadline < now, 1), else_=0)), 0)
+    ).filter(
         DataDeletionRequest.status == "pending"
-    ).all()
-    for req in pending_requests:
-        if req.deadline and req.deadline < now:
-            overdue += 1
+    ).one()
     
     # Recent consent changes (last 30 days)
     thirty_days_ago = now - timedelta(days=30)
@@ -8,8 +8,17 @@ Handles:
 - Multi-provider AI integration (Gemini/OpenAI)
 """
 import os
-from typing import List, Dict, Any, Optional
+import asyncio
+import string
+import orjson
+from collections import deque
+from typing import Iterable, List, Dict, Any, Optional
 from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import func, case
+
+from models import CopilotSuggestion
 
 # Knowledge service
 from services.knowledge import search_knowledge, get_knowledge_stats
@@ -27,6 +36,11 @@ RAG_TOP_K = 5
 # Maximum conversation history to include
 MAX_HISTORY_MESSAGES = 10
 
+# Messages rated per provider call in batched urgency analysis
+URGENCY_BATCH_SIZE = 20
+# Provider calls in flight at once while rating a batch
+URGENCY_CONCURRENCY = 4
+
 # ============================================================================
 # PROMPT TEMPLATES
 # ============================================================================
@@ -57,13 +71,69 @@ GUEST'S MESSAGE: {guest_message}
 Provide your suggested reply:"""
 
 
+def _split_template(template: str) -> tuple:
+    """Parse a str.format() template once into (literal, field_name) pairs."""
+    return tuple(
+        (literal, field_name)
+        for literal, field_name, _, _ in string.Formatter().parse(template)
+    )
+
+
+def _render_template(parts: tuple, values: Dict[str, Any]) -> str:
+    """Fill a pre-split template; same output as template.format(**values)."""
+    out = []
+    for literal, field_name in parts:
+        out.append(literal)
+        if field_name is not None:
+            out.append(str(values[field_name]))
+    return "".join(out)
+
+
+def _bind_template(parts: tuple, values: Dict[str, Any]) -> tuple:
+    """
+    Partially apply a pre-split template: fill the fields in `values` and
+    merge them into the surrounding literals, leaving the other fields open.
+    """
+    bound = []
+    pending = ""
+    for literal, field_name in parts:
+        pending += literal
+        if field_name is None:
+            continue
+        if field_name in values:
+            pending += str(values[field_name])
+        else:
+            bound.append((pending, field_name))
+            pending = ""
+    bound.append((pending, None))
+    return tuple(bound)
+
+
+# Split at import so each request only concatenates
+_SMART_REPLY_PROMPT_PARTS = _split_template(SMART_REPLY_SYSTEM_PROMPT)
+
+
+@lru_cache(maxsize=256)
+def _smart_reply_prompt_parts(channel: str, language: str) -> tuple:
+    """Smart reply template with channel and language already filled in."""
+    return _bind_template(_SMART_REPLY_PROMPT_PARTS, {"channel": channel, "language": language})
+
+
 SLA_URGENCY_PROMPT = """Based on the following unanswered guest message, rate the urgency (1-5) and explain briefly:
 
 Message: {message}
 Time waiting: {wait_time}
 Channel: {channel}
 
-Respond in JSON format: {"urgency": 1-5, "reason": "brief explanation"}"""
+Respond in JSON format: {{"urgency": 1-5, "reason": "brief explanation"}}"""
+
+
+SLA_URGENCY_BATCH_PROMPT = """For each of the following unanswered guest messages, rate the urgency (1-5) and explain briefly:
+
+{messages}
+
+Respond with only a JSON array, one entry per message, using the message's number as its id:
+[{{"id": 0, "urgency": 1-5, "reason": "brief explanation"}}, ...]"""
 
 
 # ============================================================================
@@ -74,8 +144,13 @@ def build_knowledge_context(query: str, top_k: int = RAG_TOP_K) -> str:
     """
     Retrieve relevant knowledge chunks and format as context.
     """
-    results = search_knowledge(query, n_results=top_k)
-    
+    return format_knowledge_context(search_knowledge(query, n_results=top_k))
+
+
+def format_knowledge_context(results: List[Dict[str, Any]]) -> str:
+    """
+    Format already-retrieved knowledge chunks as context.
+    """
     if not results:
         return "No relevant SOP information found for this query."
     
@@ -90,25 +165,33 @@ def build_knowledge_context(query: str, top_k: int = RAG_TOP_K) -> str:
     return "\n\n---\n\n".join(context_parts)
 
 
-def build_conversation_context(messages: List[Dict[str, Any]], max_messages: int = MAX_HISTORY_MESSAGES) -> str:
+def build_conversation_context(messages: Iterable[Dict[str, Any]], max_messages: int = MAX_HISTORY_MESSAGES) -> str:
     """
     Format recent conversation history for context.
+    Accepts a list or any iterable (e.g. streamed rows); only the last
+    `max_messages` are kept.
     """
+    # None / empty input (an empty generator is caught by the check below)
     if not messages:
         return "No previous conversation history."
     
-    recent = messages[-max_messages:] if len(messages) > max_messages else messages
+    if isinstance(messages, list):
+        recent = messages[-max_messages:]
+    else:
+        # Bounded deque drops older messages as they stream in
+        recent = deque(messages, maxlen=max_messages)
     
-    formatted = []
-    for msg in recent:
-        direction = "Guest" if msg.get("direction") == "inbound" else "Agent"
-        body = msg.get("body", "")[:200]  # Truncate long messages
-        formatted.append(f"{direction}: {body}")
+    if not recent:
+        return "No previous conversation history."
     
-    return "\n".join(formatted)
+    return "\n".join(
+        # Truncate long messages
+        ("Guest: " if msg.get("direction") == "inbound" else "Agent: ") + msg.get("body", "")[:200]
+        for msg in recent
+    )
 
 
-def generate_smart_reply(
+async def generate_smart_reply(
     guest_message: str,
     conversation_history: List[Dict[str, Any]] = None,
     channel: str = "whatsapp",
@@ -118,6 +201,10 @@ def generate_smart_reply(
     """
     Generate a smart reply suggestion using RAG.
     
+    The knowledge search and knowledge stats run concurrently in worker
+    threads, and the (blocking) provider call runs in a thread as well, so
+    the event loop is never held up.
+    
     Returns:
     {
         "suggestion": str,
@@ -126,11 +213,15 @@ def generate_smart_reply(
         "provider_used": str
     }
     """
-    # 1. Build knowledge context (RAG)
+    # 1. Build knowledge context (RAG); the same results give source_chunks
     if include_knowledge:
-        knowledge_context = build_knowledge_context(guest_message)
-        knowledge_stats = get_knowledge_stats()
+        knowledge_results, knowledge_stats = await asyncio.gather(
+            asyncio.to_thread(search_knowledge, guest_message, n_results=RAG_TOP_K),
+            asyncio.to_thread(get_knowledge_stats)
+        )
+        knowledge_context = format_knowledge_context(knowledge_results)
     else:
+        knowledge_results = []
         knowledge_context = "Knowledge base not queried for this request."
         knowledge_stats = {}
     
@@ -139,23 +230,20 @@ def generate_smart_reply(
     
     # 3. Construct prompt
     prompt = guest_message
-    system_prompt = SMART_REPLY_SYSTEM_PROMPT.format(
-        knowledge_context=knowledge_context,
-        conversation_history=conv_context,
-        channel=channel,
-        language=language,
-        guest_message=guest_message
-    )
+    system_prompt = _render_template(_smart_reply_prompt_parts(channel, language), {
+        "knowledge_context": knowledge_context,
+        "conversation_history": conv_context,
+        "guest_message": guest_message
+    })
     
     # 4. Call AI (with fallback)
     try:
-        reply, provider = _call_with_fallback(prompt, system_prompt, "copilot_suggest")
+        reply, provider = await asyncio.to_thread(
+            _call_with_fallback, prompt, system_prompt, "copilot_suggest"
+        )
         
         # Extract source chunks used (for tracking)
-        source_chunks = []
-        if include_knowledge:
-            results = search_knowledge(guest_message, n_results=RAG_TOP_K)
-            source_chunks = [r.get("id") for r in results if r.get("id")]
+        source_chunks = [r.get("id") for r in knowledge_results if r.get("id")]
         
         return {
             "suggestion": reply.strip(),
@@ -184,8 +272,6 @@ def analyze_message_urgency(
     """
     Analyze message urgency for SLA prioritization.
     """
-    import json
-    
     prompt = message
     system_prompt = SLA_URGENCY_PROMPT.format(
         message=message,
@@ -198,13 +284,13 @@ def analyze_message_urgency(
         
         # Parse JSON response
         try:
-            result = json.loads(response)
+            result = orjson.loads(response)
             return {
                 "urgency": result.get("urgency", 3),
                 "reason": result.get("reason", "Unable to determine"),
                 "provider_used": provider.value
             }
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return {
                 "urgency": 3,
                 "reason": response[:100],
@@ -219,6 +305,87 @@ def analyze_message_urgency(
         }
 
 
+def _rate_urgency_chunk(items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Rate up to URGENCY_BATCH_SIZE messages with a single provider call.
+    Entries the response leaves out (or garbles) come back as None.
+    """
+    listing = "\n\n".join(
+        f"[{i}] Message: {item['message']}\n"
+        f"Time waiting: {item.get('wait_time_minutes', 0)} minutes\n"
+        f"Channel: {item.get('channel', 'whatsapp')}"
+        for i, item in enumerate(items)
+    )
+    system_prompt = SLA_URGENCY_BATCH_PROMPT.format(messages=listing)
+    
+    try:
+        response, provider = _call_with_fallback(listing, system_prompt, "sla_analysis")
+    except Exception as e:
+        # No provider available: per-message calls would fail the same way
+        return [
+            {"urgency": 3, "reason": f"Analysis failed: {e}", "provider_used": "none"}
+            for _ in items
+        ]
+    
+    rated = {}
+    try:
+        entries = orjson.loads(response)
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            item_id = entry.get("id")
+            if isinstance(item_id, int) and 0 <= item_id < len(items):
+                rated[item_id] = {
+                    "urgency": entry.get("urgency", 3),
+                    "reason": entry.get("reason", "Unable to determine"),
+                    "provider_used": provider.value
+                }
+    except orjson.JSONDecodeError:
+        pass
+    
+    return [rated.get(i) for i in range(len(items))]
+
+
+async def analyze_message_urgency_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Analyze urgency for many messages, URGENCY_BATCH_SIZE per provider call.
+    
+    Chunks are rated concurrently in worker threads. Only the messages a
+    chunk's response left unrated are retried one by one, and every
+    provider call shares the URGENCY_CONCURRENCY cap.
+    
+    Args:
+        items: [{"message": str, "wait_time_minutes": int, "channel": str}, ...]
+    
+    Returns one analyze_message_urgency-shaped result per item, in order.
+    """
+    limit = asyncio.Semaphore(URGENCY_CONCURRENCY)
+    
+    async def limited(func, *args):
+        async with limit:
+            return await asyncio.to_thread(func, *args)
+    
+    chunks = await asyncio.gather(*(
+        limited(_rate_urgency_chunk, items[start:start + URGENCY_BATCH_SIZE])
+        for start in range(0, len(items), URGENCY_BATCH_SIZE)
+    ))
+    results = [result for chunk in chunks for result in chunk]
+    
+    unrated = [i for i, result in enumerate(results) if result is None]
+    retried = await asyncio.gather(*(
+        limited(
+            analyze_message_urgency,
+            items[i]["message"],
+            items[i].get("wait_time_minutes", 0),
+            items[i].get("channel", "whatsapp")
+        )
+        for i in unrated
+    ))
+    for i, result in zip(unrated, retried):
+        results[i] = result
+    return results
+
+
 # ============================================================================
 # COPILOT FEEDBACK
 # ============================================================================
@@ -235,8 +402,6 @@ def record_suggestion_feedback(
     if not db:
         return False
     
-    from models import CopilotSuggestion
-    
     try:
         suggestion = db.query(CopilotSuggestion).filter(
             CopilotSuggestion.id == suggestion_id
@@ -269,17 +434,17 @@ def get_copilot_stats(db = None) -> Dict[str, Any]:
     }
     
     if db:
-        from models import CopilotSuggestion
-        from sqlalchemy import func
         
         try:
-            total = db.query(func.count(CopilotSuggestion.id)).scalar() or 0
-            used = db.query(func.count(CopilotSuggestion.id)).filter(
-                CopilotSuggestion.was_used == True
-            ).scalar() or 0
-            avg_rating = db.query(func.avg(CopilotSuggestion.agent_rating)).filter(
-                CopilotSuggestion.agent_rating.isnot(None)
-            ).scalar() or 0.0
+            # One pass over the table; AVG already skips NULL ratings
+            total, used, avg_rating = db.query(
+                func.count(CopilotSuggestion.id),
+                func.sum(case((CopilotSuggestion.was_used == True, 1), else_=0)),
+                func.avg(CopilotSuggestion.agent_rating)
+            ).one()
+            total = total or 0
+            used = used or 0
+            avg_rating = avg_rating or 0.0
             
             stats["suggestions"]["total"] = total
             stats["suggestions"]["used"] = used
@@ -12,11 +12,12 @@ Features:
 - Instant demo reset
 """
 import asyncio
+import heapq
 import random
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, asdict, replace
 from enum import Enum
 import json
 
@@ -309,6 +310,44 @@ DEMO_GUESTS: Dict[str, DemoGuest] = {
         interaction_count=19,
         avg_response_time_sec=42,
         notes="Family with teenagers and elderly parent. Needs accessibility info."
+    ),
+    # Borneo persona (borneo-eco scenario)
+    "G-006": DemoGuest(
+        id="G-006",
+        name="Emma Green",
+        email="emma.green@example.co.uk",
+        phone="+44-7700-900000",
+        language="en",
+        nationality="British",
+        tier=GuestTier.GOLD,
+        channels=[Channel.WHATSAPP],
+        preferred_channel=Channel.WHATSAPP,
+        current_booking=Booking(
+            resort="Club Med Borneo",
+            room_type="Eco-Villa Forest View",
+            check_in="2026-04-10",
+            check_out="2026-04-17",
+            pax=2,
+            total_value=8200,
+            add_ons=["Jungle Trek", "Organic Farm Tour"]
+        ),
+        preferences=GuestPreferences(
+            dietary=["vegan"],
+            activities=["hiking", "nature photography"],
+            room_preferences=["quiet", "sustainable toiletries"],
+            communication_style="friendly",
+            special_occasions=[]
+        ),
+        ltv=GuestLTV(
+            historical_spend=22000,
+            total_visits=2,
+            avg_booking_value=11000,
+            predicted_annual=15000,
+            churn_risk="low"
+        ),
+        interaction_count=3,
+        avg_response_time_sec=15,
+        notes="Very focused on sustainability. Mention BREEAM certification."
     )
 }
 
@@ -461,8 +500,11 @@ DEMO_SOPS = [
     )
 ]
 
+# SOPs never change, so their dict form is built once
+_SOPS_PAYLOAD = [asdict(sop) for sop in DEMO_SOPS]
+
 # ============================================================================
-# EXTENDED GUESTS (Add Borneo Persona)
+# EXTENDED SCENARIOS (Borneo Persona)
 # ============================================================================
 
 DEMO_SCENARIOS.append({
@@ -477,6 +519,9 @@ DEMO_SCENARIOS.append({
     "urgency": "low"
 })
 
+# Scenario lookup by id (scenarios are only defined at import time)
+DEMO_SCENARIOS_BY_ID = {s["id"]: s for s in DEMO_SCENARIOS}
+
 # ============================================================================
 # DEMO STATE MANAGEMENT
 # ============================================================================
@@ -485,46 +530,9 @@ class DemoSimulator:
     """Manages demo state and simulates guest interactions."""
     
     def __init__(self):
-        self.guests = DEMO_GUESTS.copy()
-        
-        # Add new Borneo guest
-        self.guests["G-006"] = DemoGuest(
-            id="G-006",
-            name="Emma Green",
-            email="emma.green@example.co.uk",
-            phone="+44-7700-900000",
-            language="en",
-            nationality="British",
-            tier=GuestTier.GOLD,
-            channels=[Channel.WHATSAPP],
-            preferred_channel=Channel.WHATSAPP,
-            current_booking=Booking(
-                resort="Club Med Borneo",
-                room_type="Eco-Villa Forest View",
-                check_in="2026-04-10",
-                check_out="2026-04-17",
-                pax=2,
-                total_value=8200,
-                add_ons=["Jungle Trek", "Organic Farm Tour"]
-            ),
-            preferences=GuestPreferences(
-                dietary=["vegan"],
-                activities=["hiking", "nature photography"],
-                room_preferences=["quiet", "sustainable toiletries"],
-                communication_style="friendly",
-                special_occasions=[]
-            ),
-            ltv=GuestLTV(
-                historical_spend=22000,
-                total_visits=2,
-                avg_booking_value=11000,
-                predicted_annual=15000,
-                churn_risk="low"
-            ),
-            interaction_count=3,
-            avg_response_time_sec=15,
-            notes="Very focused on sustainability. Mention BREEAM certification."
-        )
+        # Guest objects are shared with DEMO_GUESTS until first mutated
+        # (see _own_guest), so a reset only copies this dict
+        self.guests = dict(DEMO_GUESTS)
 
         self.messages: List[DemoMessage] = []
         self.active_scenarios: Dict[str, Any] = {}
@@ -542,26 +550,70 @@ class DemoSimulator:
         }
         self.sops = DEMO_SOPS
         self._running = False
+        self._agg = self._compute_aggregates()
+        # guest_id -> to_dict() result, filled on first read
+        self._guest_payloads: Dict[str, Dict[str, Any]] = {}
+    
+    def _compute_aggregates(self) -> Dict[str, Any]:
+        """
+        Guest aggregates for the dashboard, in one pass over self.guests.
+        
+        Only depends on bookings, tiers and LTV, which nothing mutates after
+        __init__ (simulate_scenario only bumps interaction counts), so it is
+        computed once and recomputed on reset.
+        """
+        total_ltv = 0
+        total_value = 0
+        active_bookings = 0
+        tier_counts = {tier.value: 0 for tier in GuestTier}
+        for g in self.guests.values():
+            total_ltv += g.ltv.predicted_annual
+            if g.current_booking:
+                total_value += g.current_booking.total_value
+                active_bookings += 1
+            tier_counts[g.tier.value] += 1
+        
+        # nlargest is stable like sorted(..., reverse=True)[:5]
+        top5 = heapq.nlargest(5, self.guests.values(), key=lambda g: g.ltv.predicted_annual)
+        
+        return {
+            "total_ltv": total_ltv,
+            "total_value": total_value,
+            "active_bookings": active_bookings,
+            "tier_counts": tier_counts,
+            "top5": [{"name": g.name, "score": g.ltv.predicted_annual, "tier": g.tier.value} for g in top5]
+        }
+    
+    def _own_guest(self, guest: DemoGuest) -> DemoGuest:
+        """Copy-on-write: swap a shared DEMO_GUESTS entry for this simulator's own copy."""
+        if DEMO_GUESTS.get(guest.id) is guest:
+            guest = self.guests[guest.id] = replace(guest)
+        return guest
+    
+    def _guest_payload(self, guest: DemoGuest) -> Dict[str, Any]:
+        """Cached guest.to_dict(); simulate_scenario patches the fields it changes."""
+        payload = self._guest_payloads.get(guest.id)
+        if payload is None:
+            payload = self._guest_payloads[guest.id] = guest.to_dict()
+        return payload
     
     def get_guests(self) -> List[Dict[str, Any]]:
         """Return all demo guests with full profiles."""
-        return [g.to_dict() for g in self.guests.values()]
+        return [self._guest_payload(g) for g in self.guests.values()]
     
     def get_guest(self, guest_id: str) -> Optional[Dict[str, Any]]:
         """Get single guest profile."""
         guest = self.guests.get(guest_id)
-        return guest.to_dict() if guest else None
+        return self._guest_payload(guest) if guest else None
     
     def get_sops(self) -> List[Dict[str, Any]]:
         """Return all SOPs."""
-        return [asdict(sop) for sop in self.sops]
+        return _SOPS_PAYLOAD
 
     def simulate_scenario(self, scenario_id: str) -> Dict[str, Any]:
         """Trigger a demo scenario and return the first message."""
-        # Check standard scenarios + the appended one
-        all_scenarios = DEMO_SCENARIOS
-        
-        scenario = next((s for s in all_scenarios if s["id"] == scenario_id), None)
+        # Covers standard scenarios + the appended one
+        scenario = DEMO_SCENARIOS_BY_ID.get(scenario_id)
         if not scenario:
             return {"error": f"Scenario not found: {scenario_id}"}
         
@@ -592,8 +644,12 @@ class DemoSimulator:
         self.stats["total_revenue_at_risk"] += scenario["booking_value"]
         
         # Update guest interaction count
+        guest = self._own_guest(guest)
         guest.interaction_count += 1
         guest.last_interaction = message.timestamp
+        payload = self._guest_payload(guest)
+        payload["interaction_count"] = guest.interaction_count
+        payload["last_interaction"] = guest.last_interaction
         
         return {
             "message": {
@@ -611,7 +667,7 @@ class DemoSimulator:
                 },
                 "sla_status": "red" if scenario["urgency"] == "high" else "yellow" if scenario["urgency"] == "medium" else "green"
             },
-            "guest_profile": guest.to_dict(),
+            "guest_profile": payload,
             "scenario": {
                 "id": scenario["id"],
                 "name": scenario["name"],
@@ -628,37 +684,22 @@ class DemoSimulator:
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
         """Get comprehensive dashboard statistics."""
-        total_ltv = sum(g.ltv.predicted_annual for g in self.guests.values())
-        total_value = sum(
-            g.current_booking.total_value 
-            for g in self.guests.values() 
-            if g.current_booking
-        )
+        agg = self._agg
         
         return {
             "summary": {
                 "total_guests": len(self.guests),
-                "active_bookings": sum(1 for g in self.guests.values() if g.current_booking),
+                "active_bookings": agg["active_bookings"],
                 "total_interactions": self.stats["total_interactions"],
-                "total_guest_value": total_value, # Renamed from total_booking_value
-                "total_loyalty_score": total_ltv, # Renamed from total_ltv
+                "total_guest_value": agg["total_value"], # Renamed from total_booking_value
+                "total_loyalty_score": agg["total_ltv"], # Renamed from total_ltv
                 "avg_response_time_sec": self.stats["avg_response_time"] or 42.5,
                 "automation_rate": self.stats["automation_rate"],
                 "resolution_rate": self.stats["resolution_rate"]
             },
             "channel_distribution": self.stats["channels"],
-            "tier_breakdown": {
-                "Platinum": sum(1 for g in self.guests.values() if g.tier == GuestTier.PLATINUM),
-                "Gold": sum(1 for g in self.guests.values() if g.tier == GuestTier.GOLD),
-                "Silver": sum(1 for g in self.guests.values() if g.tier == GuestTier.SILVER),
-                "Member": sum(1 for g in self.guests.values() if g.tier == GuestTier.MEMBER)
-            },
-            "top_guests_by_loyalty": sorted( # Renamed from by_ltv
-                [{"name": g.name, "score": g.ltv.predicted_annual, "tier": g.tier.value} 
-                 for g in self.guests.values()],
-                key=lambda x: x["score"],
-                reverse=True
-            )[:5],
+            "tier_breakdown": dict(agg["tier_counts"]),
+            "top_guests_by_loyalty": [dict(g) for g in agg["top5"]], # Renamed from by_ltv
             "sla_performance": {
                 "on_time": 94.2,
                 "at_risk": 4.1,
@@ -694,7 +735,6 @@ class DemoSimulator:
     
     def reset(self):
         """Reset demo state to initial."""
-        # reset needs to re-instantiate guests including G-006
         self.__init__()
         return {"status": "reset", "message": "Demo state cleared"}
 
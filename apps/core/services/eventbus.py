@@ -14,20 +14,32 @@ Features:
 Upgrade Path: When scaling beyond single instance, swap to Redis.
 """
 import asyncio
+import time
 from datetime import datetime
-from typing import Dict, List, Callable, Any, Optional
-from collections import defaultdict
+from typing import Dict, List, Callable, Any, Optional, Tuple
 from dataclasses import dataclass, field
 import json
 
+# Max events taken off the queue per processor wake-up; their coroutine
+# handlers run concurrently
+EVENT_BATCH_SIZE = 64
 
-@dataclass
+
+@dataclass(slots=True)
 class Event:
     """Represents an event in the system."""
     topic: str
     payload: Dict[str, Any]
-    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
-    event_id: str = field(default_factory=lambda: f"evt_{datetime.utcnow().timestamp()}")
+    # One clock read per event; timestamp and event_id are derived on access
+    ts_ns: int = field(default_factory=time.time_ns)
+    
+    @property
+    def timestamp(self) -> str:
+        return datetime.utcfromtimestamp(self.ts_ns / 1e9).isoformat()
+    
+    @property
+    def event_id(self) -> str:
+        return f"evt_{self.ts_ns / 1e9}"
 
 
 class InMemoryEventBus:
@@ -39,8 +51,11 @@ class InMemoryEventBus:
     """
     
     def __init__(self, max_queue_size: int = 1000):
-        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        # topic -> ((handler, is_coroutine), ...); tuples are replaced, never
+        # mutated, so subscribing from inside a handler is safe mid-delivery
+        self._subscribers: Dict[str, Tuple[Tuple[Callable, bool], ...]] = {}
         self._queue: asyncio.Queue = None
+        self._task: Optional[asyncio.Task] = None
         self._running = False
         self._max_queue_size = max_queue_size
         self._stats = {
@@ -56,15 +71,19 @@ class InMemoryEventBus:
         
         self._queue = asyncio.Queue(maxsize=self._max_queue_size)
         self._running = True
-        asyncio.create_task(self._process_events())
+        self._task = asyncio.create_task(self._process_events())
     
     async def stop(self):
         """Stop the event bus processor."""
+        if self._queue and self._task:
+            # Wait until every queued event, including the batch currently
+            # being delivered, has been handled (task_done per event)
+            await self._queue.join()
         self._running = False
-        if self._queue:
-            # Process remaining events
-            while not self._queue.empty():
-                await asyncio.sleep(0.01)
+        if self._task:
+            # The processor is parked on queue.get(); cancel to release it
+            self._task.cancel()
+            self._task = None
     
     def subscribe(self, topic: str, handler: Callable):
         """
@@ -74,12 +93,13 @@ class InMemoryEventBus:
             topic: Topic name (e.g., "message.incoming", "guest.created")
             handler: Async function to call when event received
         """
-        self._subscribers[topic].append(handler)
+        subscription = (handler, asyncio.iscoroutinefunction(handler))
+        self._subscribers[topic] = self._subscribers.get(topic, ()) + (subscription,)
     
     def unsubscribe(self, topic: str, handler: Callable):
         """Remove a handler from a topic."""
         if topic in self._subscribers:
-            self._subscribers[topic] = [h for h in self._subscribers[topic] if h != handler]
+            self._subscribers[topic] = tuple(s for s in self._subscribers[topic] if s[0] != handler)
     
     async def publish(self, topic: str, payload: Dict[str, Any]):
         """
@@ -101,6 +121,7 @@ class InMemoryEventBus:
             # Drop oldest event if queue is full (should never happen at MVP scale)
             try:
                 self._queue.get_nowait()
+                self._queue.task_done()
                 self._queue.put_nowait(event)
             except:
                 self._stats["errors"] += 1
@@ -108,36 +129,56 @@ class InMemoryEventBus:
     async def _process_events(self):
         """Background task to process events from the queue."""
         while self._running:
+            # Suspend until an event arrives instead of polling with a timeout,
+            # then take whatever else is already queued (up to a batch)
+            batch = [await self._queue.get()]
+            for _ in range(min(EVENT_BATCH_SIZE - 1, self._queue.qsize())):
+                batch.append(self._queue.get_nowait())
             try:
-                event = await asyncio.wait_for(
-                    self._queue.get(),
-                    timeout=1.0
-                )
-                await self._deliver_event(event)
-            except asyncio.TimeoutError:
-                continue
+                await self._deliver_batch(batch)
             except Exception as e:
                 print(f"⚠️ Event bus error: {e}")
                 self._stats["errors"] += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
     
-    async def _deliver_event(self, event: Event):
-        """Deliver event to all subscribers."""
-        handlers = self._subscribers.get(event.topic, [])
-        
-        # Also check wildcard subscriptions
-        wildcard_handlers = self._subscribers.get("*", [])
-        all_handlers = handlers + wildcard_handlers
+    async def _deliver_batch(self, events: List[Event]):
+        """
+        Deliver a batch of events to all subscribers.
         
-        for handler in all_handlers:
-            try:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(event)
-                else:
+        Sync handlers run inline in event order; coroutine handlers for the
+        whole batch are awaited together with one gather().
+        """
+        pending = []
+        pending_topics = []
+        for event in events:
+            subscriptions = self._subscribers.get(event.topic, ())
+            # Also check wildcard subscriptions
+            if "*" in self._subscribers:
+                subscriptions += self._subscribers["*"]
+            
+            for handler, is_coroutine in subscriptions:
+                if is_coroutine:
+                    pending.append(handler(event))
+                    pending_topics.append(event.topic)
+                    continue
+                try:
                     handler(event)
-                self._stats["delivered"] += 1
-            except Exception as e:
-                print(f"⚠️ Handler error for {event.topic}: {e}")
+                    self._stats["delivered"] += 1
+                except Exception as e:
+                    print(f"⚠️ Handler error for {event.topic}: {e}")
+                    self._stats["errors"] += 1
+        
+        if not pending:
+            return
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for topic, result in zip(pending_topics, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ Handler error for {topic}: {result}")
                 self._stats["errors"] += 1
+            else:
+                self._stats["delivered"] += 1
     
     def get_stats(self) -> Dict[str, Any]:
         """Get event bus statistics."""
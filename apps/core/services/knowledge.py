@@ -11,7 +11,6 @@ Optimized for minimal dependencies and fast startup.
 Upgrade path: Migrate to pgvector or Pinecone when >10K chunks.
 """
 import os
-import uuid
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
@@ -24,6 +23,8 @@ from services.vectors import vector_store, get_embedding
 # Database
 from sqlalchemy.orm import Session
 
+from models import KnowledgeDocument, KnowledgeChunk, new_id
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -263,9 +264,8 @@ def ingest_pdf_document(
     
     Returns: document metadata dict
     """
-    from models import KnowledgeDocument, KnowledgeChunk
     
-    document_id = str(uuid.uuid4())
+    document_id = new_id()
     
     try:
         # Add document to vector store
@@ -333,7 +333,6 @@ def ingest_pdf_document(
         print(f"❌ Document ingestion failed: {e}")
         
         if db:
-            from models import KnowledgeDocument
             error_doc = KnowledgeDocument(
                 id=document_id,
                 filename=filename,
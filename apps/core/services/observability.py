@@ -12,13 +12,44 @@ import os
 import json
 import time
 import logging
+import logging.handlers
+import atexit
+import queue
 import re
+import sys
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List, Callable
 from functools import wraps
 from contextvars import ContextVar
 import uuid
 
+# Log masking runs on untrusted message bodies: use the linear-time RE2
+# engine when google-re2 is installed, same as services/compliance.py
+try:
+    import re2 as pii_re
+except ImportError:
+    pii_re = re
+
+try:
+    import psutil
+except ImportError:  # optional: saturation metrics degrade gracefully
+    psutil = None
+
+_process = None
+
+
+def _current_process():
+    """
+    Shared psutil.Process for this worker. Process.cpu_percent() measures
+    since the previous call on the same object, so a fresh one would always
+    report 0.0.
+    """
+    global _process
+    if _process is None:
+        _process = psutil.Process()
+    return _process
+
 # ============================================================================
 # CONTEXT VARIABLES (Thread-safe request context)
 # ============================================================================
@@ -40,6 +71,12 @@ PII_PATTERNS = {
     "passport": (r'\b[A-Z]{1,2}\d{6,9}\b', '[PASSPORT_REDACTED]'),
 }
 
+# Compiled once at import instead of going through re's cache on every log call
+_PII_COMPILED = [
+    (pii_re.compile(pattern), replacement)
+    for pattern, replacement in PII_PATTERNS.values()
+]
+
 # Fields that contain PII and should be fully redacted
 PII_FIELDS = {
     "password", "secret", "token", "api_key", "apikey", "authorization",
@@ -58,8 +95,8 @@ def mask_pii(value: Any, field_name: str = "") -> Any:
     
     if isinstance(value, str):
         masked = value
-        for pattern_name, (pattern, replacement) in PII_PATTERNS.items():
-            masked = re.sub(pattern, replacement, masked)
+        for regex, replacement in _PII_COMPILED:
+            masked = regex.sub(replacement, masked)
         return masked
     
     if isinstance(value, dict):
@@ -89,19 +126,27 @@ class StructuredLogger:
         # Remove existing handlers
         self.logger.handlers = []
         
-        # Add structured JSON handler
+        # Structured JSON handler, fed through a queue so formatting and the
+        # stderr write happen on a listener thread, not the request thread
         handler = logging.StreamHandler()
         handler.setFormatter(StructuredFormatter())
-        self.logger.addHandler(handler)
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(_RecordQueueHandler(log_queue))
+        self._listener = logging.handlers.QueueListener(log_queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
     
-    def _log(self, level: int, message: str, **kwargs):
+    def _log(self, level: int, message: str, exc_info: bool = False, **kwargs):
         """Internal log method with structured data."""
+        # Skip PII masking and record building for disabled levels
+        if not self.logger.isEnabledFor(level):
+            return
         extra = {
             "correlation_id": correlation_id_var.get(""),
             "service": self.name,
             "extra_data": mask_pii(kwargs)
         }
-        self.logger.log(level, message, extra=extra)
+        self.logger.log(level, message, extra=extra, exc_info=exc_info)
     
     def debug(self, message: str, **kwargs):
         self._log(logging.DEBUG, message, **kwargs)
@@ -117,6 +162,17 @@ class StructuredLogger:
     
     def critical(self, message: str, **kwargs):
         self._log(logging.CRITICAL, message, **kwargs)
+    
+    def exception(self, message: str, **kwargs):
+        """Log at ERROR with the active exception's traceback."""
+        self._log(logging.ERROR, message, exc_info=True, **kwargs)
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as-is; StructuredFormatter runs on the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 class StructuredFormatter(logging.Formatter):
@@ -124,7 +180,7 @@ class StructuredFormatter(logging.Formatter):
     
     def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -144,8 +200,9 @@ class StructuredFormatter(logging.Formatter):
         return json.dumps(log_entry)
 
 
-# Default logger instance
-logger = StructuredLogger("resortOS")
+# Default logger instance (LOG_LEVEL=DEBUG to see per-event detail)
+LOG_LEVEL = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+logger = StructuredLogger("resortOS", level=LOG_LEVEL if isinstance(LOG_LEVEL, int) else logging.INFO)
 
 
 # ============================================================================
@@ -262,11 +319,8 @@ class MetricsCollector:
     
     def _get_saturation(self) -> Dict[str, Any]:
         """Get resource saturation metrics."""
-        import sys
-        
-        try:
-            import psutil
-            process = psutil.Process()
+        if psutil is not None:
+            process = _current_process()
             
             return {
                 "memory_percent": process.memory_percent(),
@@ -274,17 +328,63 @@ class MetricsCollector:
                 "open_files": len(process.open_files()),
                 "threads": process.num_threads()
             }
-        except ImportError:
-            return {
-                "memory_mb": sys.getsizeof(self._latencies) / 1024 / 1024,
-                "note": "Install psutil for detailed metrics"
-            }
+        
+        return {
+            "memory_mb": sys.getsizeof(self._latencies) / 1024 / 1024,
+            "note": "Install psutil for detailed metrics"
+        }
 
 
 # Global metrics collector
 metrics = MetricsCollector()
 
 
+# ============================================================================
+# SYSTEM RESOURCE SAMPLER
+# ============================================================================
+
+# Seconds between host resource samples
+RESOURCE_SAMPLE_INTERVAL = float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "1.0"))
+
+# Latest host sample; replaced wholesale so readers never see a partial update
+_system_resources: Dict[str, Any] = {
+    "cpu_percent": 0.0,
+    "memory_percent": 0.0,
+    "disk_percent": 0.0,
+    "sampled_at": None
+}
+_sampler_thread: Optional[threading.Thread] = None
+
+
+def _sample_system_resources():
+    """Refresh host CPU/memory/disk usage every RESOURCE_SAMPLE_INTERVAL."""
+    global _system_resources
+    
+    while True:
+        _system_resources = {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_percent": psutil.disk_usage('/').percent,
+            "sampled_at": datetime.utcnow().isoformat() + "Z"
+        }
+        time.sleep(RESOURCE_SAMPLE_INTERVAL)
+
+
+def start_resource_sampler():
+    """Start the background resource sampler (idempotent)."""
+    global _sampler_thread
+    if _sampler_thread is None and psutil is not None:
+        _sampler_thread = threading.Thread(
+            target=_sample_system_resources, name="resource-sampler", daemon=True
+        )
+        _sampler_thread.start()
+
+
+def get_system_resources() -> Dict[str, Any]:
+    """Latest host resource sample; no syscalls on the request path."""
+    return _system_resources
+
+
 # ============================================================================
 # REQUEST TRACING DECORATOR
 # ============================================================================
@@ -396,10 +496,11 @@ ALERT_THRESHOLDS = {
 }
 
 
-def check_alerts() -> List[Dict[str, Any]]:
-    """Check current metrics against alert thresholds."""
+def check_alerts(golden: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Check current metrics (or a precomputed golden-signals snapshot) against alert thresholds."""
     alerts = []
-    golden = metrics.get_golden_signals()
+    if golden is None:
+        golden = metrics.get_golden_signals()
     
     # Check error rate
     error_rate = golden["errors"]["error_rate"]
@@ -444,10 +545,12 @@ def check_alerts() -> List[Dict[str, Any]]:
 
 def get_observability_dashboard() -> Dict[str, Any]:
     """Get comprehensive observability data for dashboards."""
+    golden = metrics.get_golden_signals()
+    alerts = check_alerts(golden)
     return {
-        "golden_signals": metrics.get_golden_signals(),
-        "alerts": check_alerts(),
+        "golden_signals": golden,
+        "alerts": alerts,
         "health": {
-            "status": HealthStatus.HEALTHY if not check_alerts() else HealthStatus.DEGRADED
+            "status": HealthStatus.HEALTHY if not alerts else HealthStatus.DEGRADED
         }
     }
@@ -12,11 +12,16 @@ import os
 import jwt
 import hashlib
 import secrets
+import queue
+import sys
+import threading
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from functools import wraps
 from enum import Enum
 
+from services.observability import logger
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -30,6 +35,11 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
 RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
 
+# Audit log: backlog of events waiting for the background writer (when it
+# is full, callers write their event inline), and events per batched write
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_WRITE_BATCH_SIZE = int(os.getenv("AUDIT_WRITE_BATCH_SIZE", "500"))
+
 # ============================================================================
 # ROLE-BASED ACCESS CONTROL
 # ============================================================================
@@ -421,6 +431,74 @@ def validate_input(value: str) -> Dict[str, Any]:
 # ============================================================================
 
 _audit_log: List[Dict] = []
+_audit_queue: queue.Queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_audit_stats = {"written": 0, "written_inline": 0}
+_audit_stats_lock = threading.Lock()
+_audit_writer_thread: Optional[threading.Thread] = None
+# Queued by flush_audit_log: the writer finishes its batch and exits
+_AUDIT_STOP = object()
+_audit_writer_stopped = False
+
+
+def _write_audit_events(events: List[Dict], inline: bool = False):
+    """Write audit events to stdout with one write + flush for the whole batch."""
+    # In production, send to centralized logging
+    sys.stdout.write("".join(
+        f"📋 AUDIT: {e['action']} on {e['resource_type']}/{e['resource_id']} by {e['user_id']}\n"
+        for e in events
+    ))
+    sys.stdout.flush()
+    with _audit_stats_lock:
+        _audit_stats["written"] += len(events)
+        if inline:
+            _audit_stats["written_inline"] += len(events)
+
+
+def _drain_audit_queue(batch: List[Dict]) -> List[Dict]:
+    while len(batch) < AUDIT_WRITE_BATCH_SIZE:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _audit_writer():
+    """Background thread: writes queued audit events in batches, off the request path."""
+    while True:
+        batch = _drain_audit_queue([_audit_queue.get()])
+        events = [e for e in batch if e is not _AUDIT_STOP]
+        if events:
+            _write_audit_events(events)
+        if len(events) < len(batch):
+            return
+
+
+def start_audit_writer():
+    """Start the background audit writer (called from the app lifespan)."""
+    global _audit_writer_thread
+    if _audit_writer_thread is None:
+        _audit_writer_thread = threading.Thread(target=_audit_writer, name="audit-writer", daemon=True)
+        _audit_writer_thread.start()
+
+
+def flush_audit_log():
+    """
+    Stop the background writer once it has written everything queued so far
+    (including a batch it is in the middle of), then write out any stragglers.
+    Call on shutdown; later events are written inline.
+    """
+    global _audit_writer_thread, _audit_writer_stopped
+    _audit_writer_stopped = True
+    writer, _audit_writer_thread = _audit_writer_thread, None
+    if writer is not None:
+        _audit_queue.put(_AUDIT_STOP)
+        writer.join()
+    while True:
+        batch = _drain_audit_queue([])
+        if not batch:
+            return
+        _write_audit_events(batch)
 
 
 def log_audit_event(
@@ -433,6 +511,9 @@ def log_audit_event(
 ):
     """
     Log an audit event for compliance tracking.
+    Writing normally happens on the background writer; if its queue is
+    full, or the writer has been stopped, the event is written inline
+    instead, so none are lost.
     """
     event = {
         "timestamp": datetime.utcnow().isoformat(),
@@ -446,8 +527,14 @@ def log_audit_event(
     
     _audit_log.append(event)
     
-    # In production, send to centralized logging
-    print(f"📋 AUDIT: {action} on {resource_type}/{resource_id} by {user_id}")
+    if _audit_writer_stopped:
+        _write_audit_events([event], inline=True)
+        return
+    try:
+        _audit_queue.put_nowait(event)
+    except queue.Full:
+        logger.warning("Audit queue full, writing event inline", queue_size=AUDIT_QUEUE_SIZE)
+        _write_audit_events([event], inline=True)
 
 
 def get_audit_log(
@@ -480,6 +567,9 @@ def get_audit_log(
 
 def get_security_stats() -> Dict[str, Any]:
     """Get security service statistics."""
+    hour_ago = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    with _audit_stats_lock:
+        audit_stats = dict(_audit_stats)
     return {
         "tokens": {
             "blacklisted": len(_token_blacklist),
@@ -491,9 +581,8 @@ def get_security_stats() -> Dict[str, Any]:
         },
         "audit": {
             "total_events": len(_audit_log),
-            "recent_events": len([
-                e for e in _audit_log 
-                if e["timestamp"] > (datetime.utcnow() - timedelta(hours=1)).isoformat()
-            ])
+            "recent_events": sum(1 for e in list(_audit_log) if e["timestamp"] > hour_ago),
+            "pending_writes": _audit_queue.qsize(),
+            **audit_stats
         }
     }
@@ -12,6 +12,10 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
+from sqlalchemy import func
+
+from models import ThreadModel
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -108,7 +112,6 @@ async def check_all_threads_sla(db, sio=None) -> List[Dict[str, Any]]:
     Check SLA status for all active threads.
     Returns list of threads that need attention.
     """
-    from models import ThreadModel
     
     alerts = []
     
@@ -216,8 +219,6 @@ def get_sla_stats(db) -> Dict[str, Any]:
     """
     Get SLA statistics for dashboard.
     """
-    from models import ThreadModel
-    from sqlalchemy import func
     
     try:
         total = db.query(func.count(ThreadModel.id)).filter(
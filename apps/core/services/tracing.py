@@ -15,6 +15,10 @@ import os
 import time
 import uuid
 import json
+import orjson
+import threading
+import zlib
+from collections import OrderedDict, deque
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from contextvars import ContextVar
@@ -162,6 +166,7 @@ class Span:
         if exc_type:
             self.set_status("ERROR", str(exc_val))
         self.end()
+        record_span(self)
         
         spans = _current_spans.get() or []
         if spans:
@@ -238,36 +243,89 @@ def trace_async(name: str = None, kind: str = "internal"):
 # TRACE COLLECTION & EXPORT
 # ============================================================================
 
-# In-memory trace storage (replace with proper exporter in production)
-_trace_buffer: List[Dict] = []
-_max_buffer_size = 1000
+# In-memory trace storage (replace with proper exporter in production).
+# Spans are serialised once when recorded; readers only slice and join bytes.
+_max_buffer_size = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+# Distinct trace IDs kept for by-ID lookup, and spans kept per trace
+_max_indexed_traces = int(os.getenv("TRACE_INDEX_SIZE", "1000"))
+_max_spans_per_trace = 256
+
+# (span JSON, durationMs, is_error), oldest first
+_trace_buffer: deque = deque(maxlen=_max_buffer_size)
+# trace ID -> span JSON, least recently used (recorded or looked up) first
+_trace_index: "OrderedDict[str, deque]" = OrderedDict()
+# Spans end on worker threads as well as the event loop
+_trace_lock = threading.Lock()
+
+
+def _is_sampled(trace_id: str) -> bool:
+    """Keep or drop whole traces: the decision depends only on the trace ID."""
+    if TRACE_SAMPLE_RATE >= 1.0:
+        return True
+    return zlib.crc32(trace_id.encode()) < TRACE_SAMPLE_RATE * 2**32
 
 
 def record_span(span: Span):
-    """Record a completed span to the buffer."""
-    global _trace_buffer
+    """Record a completed span to the buffer (called from Span.__exit__)."""
+    if not TRACE_ENABLED or not _is_sampled(span.trace_id):
+        return
+    data = span.to_dict()
+    blob = orjson.dumps(data, default=str)
     
-    if len(_trace_buffer) >= _max_buffer_size:
-        # Drop oldest traces
-        _trace_buffer = _trace_buffer[100:]
-    
-    _trace_buffer.append(span.to_dict())
+    with _trace_lock:
+        _trace_buffer.append((blob, data["durationMs"], data["status"] == "ERROR"))
+        
+        spans = _trace_index.get(span.trace_id)
+        if spans is None:
+            spans = _trace_index[span.trace_id] = deque(maxlen=_max_spans_per_trace)
+            if len(_trace_index) > _max_indexed_traces:
+                _trace_index.popitem(last=False)
+        else:
+            _trace_index.move_to_end(span.trace_id)
+        spans.append(blob)
+
+
+def _json_array(blobs) -> bytes:
+    return b"[" + b",".join(blobs) + b"]"
+
+
+def get_recent_traces_json(limit: int = 100) -> bytes:
+    """Recent spans as a pre-rendered JSON array."""
+    if limit <= 0:
+        return b"[]"
+    # Snapshot first: spans may be recorded while the array is joined
+    with _trace_lock:
+        recent = list(_trace_buffer)[-limit:]
+    return _json_array(entry[0] for entry in recent)
+
+
+def get_trace_by_id_json(trace_id: str) -> bytes:
+    """All recorded spans for a trace as a pre-rendered JSON array."""
+    with _trace_lock:
+        spans = _trace_index.get(trace_id)
+        if spans is None:
+            return b"[]"
+        _trace_index.move_to_end(trace_id)
+        spans = list(spans)
+    return _json_array(spans)
 
 
 def get_recent_traces(limit: int = 100) -> List[Dict]:
     """Get recent traces for debugging."""
-    return _trace_buffer[-limit:]
+    return orjson.loads(get_recent_traces_json(limit))
 
 
 def get_trace_by_id(trace_id: str) -> List[Dict]:
     """Get all spans for a specific trace."""
-    return [s for s in _trace_buffer if s["traceId"] == trace_id]
+    return orjson.loads(get_trace_by_id_json(trace_id))
 
 
 def clear_trace_buffer():
     """Clear the trace buffer."""
-    global _trace_buffer
-    _trace_buffer = []
+    global _trace_buffer, _trace_index
+    with _trace_lock:
+        _trace_buffer = deque(maxlen=_max_buffer_size)
+        _trace_index = OrderedDict()
 
 
 def get_tracing_stats() -> Dict[str, Any]:
@@ -281,15 +339,17 @@ def get_tracing_stats() -> Dict[str, Any]:
         }
     
     # Calculate stats
-    durations = [s["durationMs"] for s in _trace_buffer if s.get("durationMs")]
-    errors = [s for s in _trace_buffer if s.get("status") == "ERROR"]
+    with _trace_lock:
+        buffer = list(_trace_buffer)
+    durations = [duration for _, duration, _ in buffer if duration]
+    error_count = sum(1 for _, _, is_error in buffer if is_error)
     
     return {
         "enabled": TRACE_ENABLED,
         "sample_rate": TRACE_SAMPLE_RATE,
-        "buffer_size": len(_trace_buffer),
-        "spans_recorded": len(_trace_buffer),
-        "error_count": len(errors),
+        "buffer_size": len(buffer),
+        "spans_recorded": len(buffer),
+        "error_count": error_count,
         "avg_duration_ms": round(sum(durations) / len(durations), 2) if durations else 0,
         "p95_duration_ms": round(sorted(durations)[int(len(durations) * 0.95)], 2) if durations else 0
     }
@@ -11,8 +11,11 @@ from typing import Optional, Tuple, Dict, Any
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 import threading
 
+from services.observability import logger
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -50,6 +53,9 @@ PROVIDERS: Dict[AIProvider, ProviderConfig] = {
     )
 }
 
+# Max distinct texts whose detection / translation results are kept in memory
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))
+
 # Supported languages for Club Med resorts
 SUPPORTED_LANGUAGES = {
     "en": "English",
@@ -302,6 +308,43 @@ def reset_provider(provider: AIProvider):
 # PUBLIC API
 # ============================================================================
 
+# Successful AI results are memoized per text; failures raise and are never
+# cached, so a provider outage doesn't pin the fallback answer.
+
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def _detect_language_cached(text: str) -> Tuple[str, float]:
+    system_prompt = """You are a language detection assistant. Analyze the input text and return ONLY a JSON object with:
+- "language_code": ISO 639-1 code (e.g., "en", "ja", "zh", "fr")
+- "confidence": float between 0 and 1
+Do not include any other text, just the JSON."""
+    
+    response, provider = _call_with_fallback(text, system_prompt, "detect_language")
+    result = json.loads(response)
+    return (result.get("language_code", "en"), result.get("confidence", 0.5))
+
+
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def _translate_text_cached(text: str, source_lang: str, target_lang: str) -> str:
+    source_name = SUPPORTED_LANGUAGES.get(source_lang, source_lang)
+    target_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
+    
+    system_prompt = f"""You are a professional translator for Club Med resort communications.
+Translate the following text from {source_name} to {target_name}.
+Maintain a friendly, hospitable tone appropriate for luxury resort guest services.
+Return ONLY the translated text, no explanations."""
+    
+    response, provider = _call_with_fallback(text, system_prompt, "translate")
+    logger.debug("Translated text", source_language=source_lang, target_language=target_lang, chars=len(text))
+    return response
+
+
+def clear_translation_cache():
+    """Drop all memoized detection and translation results."""
+    _detect_language_cached.cache_clear()
+    _translate_text_cached.cache_clear()
+    print("🧹 Translation cache cleared")
+
+
 def detect_language(text: str) -> Tuple[str, float]:
     """
     Detect the language of input text.
@@ -310,15 +353,8 @@ def detect_language(text: str) -> Tuple[str, float]:
     if not text.strip():
         return ("en", 0.0)
     
-    system_prompt = """You are a language detection assistant. Analyze the input text and return ONLY a JSON object with:
-- "language_code": ISO 639-1 code (e.g., "en", "ja", "zh", "fr")
-- "confidence": float between 0 and 1
-Do not include any other text, just the JSON."""
-    
     try:
-        response, provider = _call_with_fallback(text, system_prompt, "detect_language")
-        result = json.loads(response)
-        return (result.get("language_code", "en"), result.get("confidence", 0.5))
+        return _detect_language_cached(text)
     except Exception as e:
         print(f"❌ Language detection failed: {e}")
         return ("en", 0.0)
@@ -332,18 +368,8 @@ def translate_text(text: str, source_lang: str, target_lang: str = "en") -> str:
     if not text.strip() or source_lang == target_lang:
         return text
     
-    source_name = SUPPORTED_LANGUAGES.get(source_lang, source_lang)
-    target_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-    
-    system_prompt = f"""You are a professional translator for Club Med resort communications.
-Translate the following text from {source_name} to {target_name}.
-Maintain a friendly, hospitable tone appropriate for luxury resort guest services.
-Return ONLY the translated text, no explanations."""
-    
     try:
-        response, provider = _call_with_fallback(text, system_prompt, "translate")
-        print(f"🌐 Translated [{source_lang} → {target_lang}]: '{text[:30]}...' → '{response[:30]}...'")
-        return response
+        return _translate_text_cached(text, source_lang, target_lang)
     except Exception as e:
         print(f"❌ Translation failed: {e}")
         return text
@@ -358,7 +384,7 @@ def process_message_translation(message_body: str, guest_language: Optional[str]
         confidence = 1.0
     else:
         detected_lang, confidence = detect_language(message_body)
-        print(f"🔍 Detected language: {detected_lang} (confidence: {confidence:.2f})")
+        logger.debug("Detected language", language=detected_lang, confidence=round(confidence, 2))
     
     translated_text = translate_text(message_body, detected_lang, "en")
     
@@ -382,5 +408,9 @@ def get_usage_stats() -> Dict[str, Any]:
     """Get usage statistics for monitoring."""
     return {
         "provider_status": usage_tracker.get_provider_status(),
-        "usage": usage_tracker.get_summary()
+        "usage": usage_tracker.get_summary(),
+        "cache": {
+            "detect_language": _detect_language_cached.cache_info()._asdict(),
+            "translate": _translate_text_cached.cache_info()._asdict()
+        }
     }
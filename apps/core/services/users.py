@@ -10,9 +10,14 @@ Handles:
 """
 import os
 import hashlib
+import hmac
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+from models import UserModel
 
 # Use SHA256 for password hashing (in production use bcrypt/argon2)
 # Note: For proper security, add bcrypt to requirements and use that
@@ -23,6 +28,12 @@ PASSWORD_SALT = os.getenv("PASSWORD_SALT", secrets.token_hex(16))
 MAX_FAILED_ATTEMPTS = 5
 LOCKOUT_DURATION_MINUTES = 15
 
+# Failed-attempt counters live in memory (like the event bus cache) so a
+# credential-stuffing run is not a DB UPDATE per guess; the DB only records
+# the lockout itself. user_id -> (count, window start in monotonic seconds)
+_failed_attempts: Dict[str, Tuple[int, float]] = {}
+_failed_attempts_lock = threading.Lock()
+
 
 # ============================================================================
 # PASSWORD HASHING
@@ -48,8 +59,34 @@ def hash_password(password: str, salt: str = None) -> str:
 
 
 def verify_password(password: str, hashed: str, salt: str = None) -> bool:
-    """Verify a password against its hash."""
-    return hash_password(password, salt) == hashed
+    """Verify a password against its hash (constant-time compare)."""
+    return hmac.compare_digest(hash_password(password, salt), hashed)
+
+
+def _burn_password_check(password: str):
+    """Spend the same PBKDF2 time as a real check, so unknown emails don't answer faster."""
+    verify_password(password, "")
+
+
+# ============================================================================
+# FAILED LOGIN TRACKING
+# ============================================================================
+
+def _record_failed_attempt(user_id: str) -> int:
+    """Count a failed login; the window resets after LOCKOUT_DURATION_MINUTES."""
+    now = time.monotonic()
+    with _failed_attempts_lock:
+        count, started = _failed_attempts.get(user_id, (0, now))
+        if now - started > LOCKOUT_DURATION_MINUTES * 60:
+            count, started = 0, now
+        count += 1
+        _failed_attempts[user_id] = (count, started)
+    return count
+
+
+def _clear_failed_attempts(user_id: str):
+    with _failed_attempts_lock:
+        _failed_attempts.pop(user_id, None)
 
 
 # ============================================================================
@@ -68,7 +105,6 @@ def create_user(
     """
     Create a new user with hashed password.
     """
-    from models import UserModel
     
     if not db:
         return {"error": "Database session required"}
@@ -116,11 +152,11 @@ def authenticate_user(email: str, password: str, db) -> Dict[str, Any]:
     
     Implements account lockout after failed attempts.
     """
-    from models import UserModel
     
     user = db.query(UserModel).filter(UserModel.email == email).first()
     
     if not user:
+        _burn_password_check(password)
         return {"error": "Invalid credentials", "authenticated": False}
     
     # Check account status
@@ -138,16 +174,17 @@ def authenticate_user(email: str, password: str, db) -> Dict[str, Any]:
     
     # Verify password
     if not verify_password(password, user.hashed_password):
-        # Increment failed attempts
-        user.failed_login_attempts = (user.failed_login_attempts or 0) + 1
+        failed_attempts = _record_failed_attempt(user.id)
         
-        if user.failed_login_attempts >= MAX_FAILED_ATTEMPTS:
+        # Only the threshold crossing is written to the DB
+        if failed_attempts >= MAX_FAILED_ATTEMPTS:
+            user.failed_login_attempts = failed_attempts
             user.locked_until = datetime.utcnow() + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
+            db.commit()
+            _clear_failed_attempts(user.id)
             print(f"🔒 Account locked: {email}")
         
-        db.commit()
-        
-        remaining_attempts = MAX_FAILED_ATTEMPTS - user.failed_login_attempts
+        remaining_attempts = MAX_FAILED_ATTEMPTS - failed_attempts
         return {
             "error": "Invalid credentials",
             "authenticated": False,
@@ -155,6 +192,7 @@ def authenticate_user(email: str, password: str, db) -> Dict[str, Any]:
         }
     
     # Successful login
+    _clear_failed_attempts(user.id)
     user.failed_login_attempts = 0
     user.locked_until = None
     user.last_login = datetime.utcnow()
@@ -183,7 +221,6 @@ def change_password(
     """
     Change a user's password.
     """
-    from models import UserModel
     
     user = db.query(UserModel).filter(UserModel.id == user_id).first()
     
@@ -206,7 +243,6 @@ def reset_password(user_id: str, new_password: str, db) -> Dict[str, Any]:
     """
     Admin password reset (no current password required).
     """
-    from models import UserModel
     
     user = db.query(UserModel).filter(UserModel.id == user_id).first()
     
@@ -218,6 +254,7 @@ def reset_password(user_id: str, new_password: str, db) -> Dict[str, Any]:
     user.failed_login_attempts = 0
     user.locked_until = None
     db.commit()
+    _clear_failed_attempts(user.id)
     
     print(f"🔑 Password reset by admin: {user.email}")
     
@@ -226,7 +263,6 @@ def reset_password(user_id: str, new_password: str, db) -> Dict[str, Any]:
 
 def deactivate_user(user_id: str, db) -> Dict[str, Any]:
     """Deactivate a user account."""
-    from models import UserModel
     
     user = db.query(UserModel).filter(UserModel.id == user_id).first()
     
@@ -243,7 +279,6 @@ def deactivate_user(user_id: str, db) -> Dict[str, Any]:
 
 def list_users(db, resort_id: str = None) -> list:
     """List all users, optionally filtered by resort."""
-    from models import UserModel
     
     query = db.query(UserModel)
     
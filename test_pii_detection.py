@@ -0,0 +1,26 @@
+"""
+Test script for the core PII endpoints.
+Checks that structured PII (card numbers) is still reported under its own
+category and not only as the phone-length digit run it also matches.
+"""
+import httpx
+
+CORE_URL = "http://localhost:8001"
+
+if __name__ == "__main__":
+    response = httpx.post(
+        f"{CORE_URL}/compliance/pii/detect",
+        json={"text": "card 4111111111111111"}
+    )
+    print(f"Status: {response.status_code}")
+    print(f"Body: {response.json()}")
+    assert "credit_card" in response.json()["categories"]
+
+    response = httpx.post(
+        f"{CORE_URL}/compliance/pii/mask",
+        json={"text": "card 4111111111111111"}
+    )
+    print(f"Status: {response.status_code}")
+    print(f"Body: {response.json()}")
+    assert response.json()["masked_text"] == "card [CREDIT_CARD_REDACTED]"
+    print("✅ Card numbers are reported as credit_card")
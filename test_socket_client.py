@@ -11,6 +11,10 @@ async def connect():
 async def new_message(data):
     print(f"📩 Received Socket.IO Event: {data}")
 
+@sio.event
+async def new_message_batch(data):
+    print(f"📩 Received Socket.IO Batch ({len(data)} messages): {data}")
+
 @sio.event
 async def disconnect():
     print("❌ Disconnected from server")